@@ -77,21 +77,11 @@ export default function Inventory() {
   const importExcelMutation = useMutation({
     mutationFn: async (products: any[]) => {
       console.log('Starting import of', products.length, 'products');
-      const results = [];
-      let successCount = 0;
-      let errorCount = 0;
-      
-      for (const product of products) {
-        try {
-          const response = await apiRequest('POST', '/api/products', product);
-          const result = await response.json();
-          results.push(result);
-          successCount++;
-          console.log('Successfully created product:', result.name);
-        } catch (error) {
-          console.error('Failed to create product:', product.name, error);
-          errorCount++;
-        }
+      // Send the whole sheet in one request instead of a POST per product
+      const response = await apiRequest('POST', '/api/products/bulk', { products });
+      const { products: results, successCount, errorCount, errors } = await response.json();
+      if (errorCount > 0) {
+        console.error('Failed to create products:', errors);
       }
       
       return { results, successCount, errorCount, totalAttempted: products.length };
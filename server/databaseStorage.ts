@@ -1,4 +1,4 @@
-import { eq, and, sql, isNotNull } from "drizzle-orm";
+import { eq, ne, and, sql, count, isNotNull, inArray } from "drizzle-orm";
 import { db } from "./db";
 import {
   users,
@@ -24,12 +24,29 @@ import {
   type InsertInvoice,
   type InsertInvoiceLineItem,
 } from "@shared/schema";
-import { IStorage } from "./storage";
+import { IStorage, type DashboardStats } from "./storage";
 import { randomUUID } from "crypto";
 
+// How long dashboard stats may be served from memory before recomputing
+const DASHBOARD_STATS_TTL_MS = 30_000;
+
+// How long a system setting (e.g. the QuickBooks tokens) may be served from
+// memory; bounds staleness when another server instance updates it
+const SYSTEM_SETTING_TTL_MS = 60_000;
+
 export class DatabaseStorage implements IStorage {
   private initialized = false;
 
+  // Cached dashboard stats; cleared whenever an invoice, product or scheme is written
+  private dashboardStatsCache: { stats: DashboardStats; expiresAt: number } | null = null;
+
+  private invalidateDashboardStats() {
+    this.dashboardStatsCache = null;
+  }
+
+  // System settings are read on most authenticated requests but rarely written
+  private systemSettingsCache: Map<string, { value: any; expiresAt: number }> = new Map();
+
   private async ensureInitialized() {
     if (this.initialized) return;
     
@@ -135,6 +152,12 @@ export class DatabaseStorage implements IStorage {
     return customer;
   }
 
+  async createCustomers(insertCustomers: Array<InsertCustomer & { userId: string }>): Promise<Customer[]> {
+    if (insertCustomers.length === 0) return [];
+    // Single multi-row INSERT instead of one round-trip per customer
+    return await db.insert(customers).values(insertCustomers).returning();
+  }
+
   async updateCustomer(id: string, updates: Partial<Customer>): Promise<Customer | undefined> {
     const [customer] = await db.update(customers).set(updates).where(eq(customers.id, id)).returning();
     return customer;
@@ -156,23 +179,51 @@ export class DatabaseStorage implements IStorage {
     return product;
   }
 
+  async getProductsByIds(ids: string[]): Promise<Product[]> {
+    if (ids.length === 0) return [];
+    return await db.select().from(products).where(inArray(products.id, ids));
+  }
+
   async createProduct(insertProduct: InsertProduct & { userId: string }): Promise<Product> {
     const [product] = await db.insert(products).values(insertProduct).returning();
+    this.invalidateDashboardStats();
     return product;
   }
 
+  async createProducts(insertProducts: Array<InsertProduct & { userId: string }>): Promise<Product[]> {
+    if (insertProducts.length === 0) return [];
+    // Single multi-row INSERT instead of one round-trip per product
+    const created = await db.insert(products).values(insertProducts).returning();
+    this.invalidateDashboardStats();
+    return created;
+  }
+
   async updateProduct(id: string, updates: Partial<Product>): Promise<Product | undefined> {
     const [product] = await db.update(products).set(updates).where(eq(products.id, id)).returning();
+    this.invalidateDashboardStats();
+    return product;
+  }
+
+  async adjustProductQty(id: string, delta: number, updates: Partial<Product> = {}): Promise<Product | undefined> {
+    // Applied as a delta in SQL so concurrent invoices can't overwrite each
+    // other's stock change; stock never goes below zero
+    const [product] = await db.update(products)
+      .set({ ...updates, qty: sql`GREATEST(${products.qty} + ${delta}, 0)` })
+      .where(eq(products.id, id))
+      .returning();
+    this.invalidateDashboardStats();
     return product;
   }
 
   async deleteProduct(id: string): Promise<boolean> {
     const result = await db.delete(products).where(eq(products.id, id));
+    this.invalidateDashboardStats();
     return (result.rowCount || 0) > 0;
   }
 
   async deleteAllProducts(userId: string): Promise<boolean> {
     const result = await db.delete(products).where(eq(products.userId, userId));
+    this.invalidateDashboardStats();
     return (result.rowCount || 0) > 0;
   }
 
@@ -256,6 +307,7 @@ export class DatabaseStorage implements IStorage {
 
   async createProductScheme(insertScheme: InsertProductScheme & { userId: string }): Promise<ProductScheme> {
     const [scheme] = await db.insert(productSchemes).values(insertScheme).returning();
+    this.invalidateDashboardStats();
     return scheme;
   }
 
@@ -265,6 +317,7 @@ export class DatabaseStorage implements IStorage {
 
   async updateProductScheme(id: string, updates: Partial<ProductScheme>): Promise<ProductScheme | undefined> {
     const [scheme] = await db.update(productSchemes).set(updates).where(eq(productSchemes.id, id)).returning();
+    this.invalidateDashboardStats();
     return scheme;
   }
 
@@ -280,6 +333,7 @@ export class DatabaseStorage implements IStorage {
     
     // Then delete the scheme itself
     const result = await db.delete(productSchemes).where(eq(productSchemes.id, id));
+    this.invalidateDashboardStats();
     return (result.rowCount || 0) > 0;
   }
 
@@ -293,6 +347,53 @@ export class DatabaseStorage implements IStorage {
     return await db.select().from(invoices);
   }
 
+  async getDashboardStats(): Promise<DashboardStats> {
+    if (this.dashboardStatsCache && Date.now() < this.dashboardStatsCache.expiresAt) {
+      return this.dashboardStatsCache.stats;
+    }
+
+    // Aggregate and format in SQL so each table returns one summary row
+    // instead of every row being parsed and summed in JS
+    const [[invoiceTotals], [productTotals], [schemeTotals]] = await Promise.all([
+      db
+        .select({
+          totalRevenue: sql<string>`COALESCE(SUM(${invoices.total}) FILTER (WHERE ${invoices.invoiceType} = 'receivable'), 0)::numeric(14, 2)::text`,
+          totalPurchase: sql<string>`COALESCE(SUM(${invoices.total}) FILTER (WHERE ${invoices.invoiceType} = 'payable'), 0)::numeric(14, 2)::text`,
+          activeInvoices: sql<number>`(COUNT(*) FILTER (WHERE ${invoices.status} IN ('sent', 'draft')))::int`,
+        })
+        .from(invoices),
+      db
+        .select({
+          productsInStock: sql<number>`COALESCE(SUM(${products.qty}), 0)::int`,
+          // Low stock is 1-10 units on hand
+          lowStockCount: sql<number>`(COUNT(*) FILTER (WHERE ${products.qty} > 0 AND ${products.qty} <= 10))::int`,
+        })
+        .from(products),
+      db
+        .select({
+          activeSchemes: sql<number>`(COUNT(*) FILTER (WHERE ${productSchemes.isActive}))::int`,
+        })
+        .from(productSchemes),
+    ]);
+    const stats: DashboardStats = { ...invoiceTotals, ...productTotals, ...schemeTotals };
+    this.dashboardStatsCache = { stats, expiresAt: Date.now() + DASHBOARD_STATS_TTL_MS };
+    return stats;
+  }
+
+  async getSyncedInvoiceCount(): Promise<number> {
+    // Count invoices with a posted journal entry in the database, not in JS
+    const [result] = await db
+      .select({ count: count() })
+      .from(invoices)
+      .where(
+        and(
+          isNotNull(invoices.quickbooksInvoiceId),
+          ne(invoices.quickbooksInvoiceId, ""),
+        ),
+      );
+    return result.count;
+  }
+
   async getInvoice(id: string): Promise<Invoice | undefined> {
     const [invoice] = await db.select().from(invoices).where(eq(invoices.id, id));
     if (!invoice) return undefined;
@@ -311,11 +412,13 @@ export class DatabaseStorage implements IStorage {
 
   async createInvoice(insertInvoice: InsertInvoice & { userId: string }): Promise<Invoice> {
     const [invoice] = await db.insert(invoices).values(insertInvoice).returning();
+    this.invalidateDashboardStats();
     return invoice;
   }
 
   async updateInvoice(id: string, updates: Partial<Invoice>): Promise<Invoice | undefined> {
     const [invoice] = await db.update(invoices).set(updates).where(eq(invoices.id, id)).returning();
+    this.invalidateDashboardStats();
     return invoice;
   }
 
@@ -324,6 +427,7 @@ export class DatabaseStorage implements IStorage {
       .set({ status, updatedAt: new Date() })
       .where(eq(invoices.id, id))
       .returning();
+    this.invalidateDashboardStats();
     return !!invoice;
   }
 
@@ -333,6 +437,7 @@ export class DatabaseStorage implements IStorage {
     
     // Then delete the invoice itself
     const result = await db.delete(invoices).where(eq(invoices.id, id));
+    this.invalidateDashboardStats();
     return (result.rowCount || 0) > 0;
   }
 
@@ -355,6 +460,12 @@ export class DatabaseStorage implements IStorage {
     return this.createInvoiceLineItem(insertItem);
   }
 
+  async createLineItems(insertItems: InsertInvoiceLineItem[]): Promise<InvoiceLineItem[]> {
+    if (insertItems.length === 0) return [];
+    // Single multi-row INSERT; RETURNING rows come back in VALUES order
+    return await db.insert(invoiceLineItems).values(insertItems).returning();
+  }
+
   async updateInvoiceLineItem(id: string, updates: Partial<InvoiceLineItem>): Promise<InvoiceLineItem | undefined> {
     const [item] = await db.update(invoiceLineItems).set(updates).where(eq(invoiceLineItems.id, id)).returning();
     return item;
@@ -375,25 +486,41 @@ export class DatabaseStorage implements IStorage {
   }
 
   // System Settings (for system-wide QuickBooks config)
-  async getSystemSetting(key: string): Promise<any> {
+  async getSystemSetting(key: string, options?: { bypassCache?: boolean }): Promise<any> {
+    const cached = this.systemSettingsCache.get(key);
+    if (cached && !options?.bypassCache && Date.now() < cached.expiresAt) {
+      return cached.value;
+    }
+
     const [setting] = await db.select().from(systemSettings).where(eq(systemSettings.key, key));
+    // Only existing rows are cached, so a key set on another instance (e.g.
+    // QuickBooks just connected) shows up on the next read
+    if (setting) {
+      this.systemSettingsCache.set(key, {
+        value: setting.value,
+        expiresAt: Date.now() + SYSTEM_SETTING_TTL_MS,
+      });
+    } else {
+      this.systemSettingsCache.delete(key);
+    }
     return setting?.value;
   }
 
   async setSystemSetting(key: string, value: any): Promise<void> {
-    const existing = await db.select().from(systemSettings).where(eq(systemSettings.key, key));
-    
-    if (existing.length > 0) {
-      await db.update(systemSettings)
-        .set({ value, updatedAt: new Date() })
-        .where(eq(systemSettings.key, key));
-    } else {
-      await db.insert(systemSettings).values({ key, value });
-    }
+    // Single atomic upsert on the unique key instead of select-then-branch
+    await db.insert(systemSettings)
+      .values({ key, value })
+      .onConflictDoUpdate({
+        target: systemSettings.key,
+        set: { value, updatedAt: new Date() },
+      });
+    // Dropped rather than overwritten so the next read sees the stored JSON shape
+    this.systemSettingsCache.delete(key);
   }
 
   async deleteSystemSetting(key: string): Promise<boolean> {
     const result = await db.delete(systemSettings).where(eq(systemSettings.key, key));
+    this.systemSettingsCache.delete(key);
     return (result.rowCount || 0) > 0;
   }
 }
\ No newline at end of file
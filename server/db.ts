@@ -11,5 +11,20 @@ if (!process.env.DATABASE_URL) {
   );
 }
 
-export const pool = new Pool({ connectionString: process.env.DATABASE_URL });
+export const pool = new Pool({
+  connectionString: process.env.DATABASE_URL,
+  // Explicit sizing so concurrent requests don't queue behind the default of 10
+  max: parseInt(process.env.DB_POOL_MAX || '20', 10),
+  // Release idle connections before the server side drops them
+  idleTimeoutMillis: 30_000,
+  // Error out instead of waiting forever when the pool is exhausted
+  connectionTimeoutMillis: 30_000,
+});
+
+// An idle client can error out (e.g. database restart); log it instead of
+// letting the unhandled 'error' event crash the process. The pool discards it.
+pool.on('error', (err) => {
+  console.error('Unexpected database pool error:', err);
+});
+
 export const db = drizzle({ client: pool, schema });
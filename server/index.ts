@@ -3,26 +3,34 @@ import { registerRoutes } from "./routes";
 import { setupVite, serveStatic, log } from "./vite";
 
 const app = express();
-app.use(express.json());
+// Raised from the 100kb default so bulk imports fit in a single request
+app.use(express.json({ limit: "5mb" }));
 app.use(express.urlencoded({ extended: false }));
 
 app.use((req, res, next) => {
   const start = Date.now();
   const path = req.path;
-  let capturedJsonResponse: Record<string, any> | undefined = undefined;
+  let capturedJsonBody: string | undefined = undefined;
 
-  const originalResJson = res.json;
-  res.json = function (bodyJson, ...args) {
-    capturedJsonResponse = bodyJson;
-    return originalResJson.apply(res, [bodyJson, ...args]);
+  // res.json serializes the payload and passes the string on to res.send, so
+  // capture that string for the log line instead of stringifying it again
+  const originalResSend = res.send;
+  res.send = function (body, ...args) {
+    if (
+      typeof body === "string" &&
+      res.get("Content-Type")?.startsWith("application/json")
+    ) {
+      capturedJsonBody = body;
+    }
+    return originalResSend.apply(res, [body, ...args]);
   };
 
   res.on("finish", () => {
     const duration = Date.now() - start;
     if (path.startsWith("/api")) {
       let logLine = `${req.method} ${path} ${res.statusCode} in ${duration}ms`;
-      if (capturedJsonResponse) {
-        logLine += ` :: ${JSON.stringify(capturedJsonResponse)}`;
+      if (capturedJsonBody) {
+        logLine += ` :: ${capturedJsonBody}`;
       }
 
       if (logLine.length > 80) {
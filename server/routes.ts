@@ -12,10 +12,57 @@ import {
   insertProductSchemeSchema,
   insertInvoiceSchema,
   insertInvoiceLineItemSchema,
+  type InsertCustomer,
+  type InsertProduct,
+  type InsertInvoiceLineItem,
 } from "@shared/schema";
 import { isAuthenticated, requireRole } from "./auth";
 import { registerAuthRoutes } from "./authRoutes";
 
+// Number of imported rows written per INSERT statement
+const IMPORT_BATCH_SIZE = 50;
+
+// Inserts imported rows IMPORT_BATCH_SIZE at a time. A failed multi-row INSERT
+// writes nothing, so that batch is retried row by row and only the rows the
+// database actually rejects are reported, against their sheet row numbers.
+async function insertInBatches<T, R>(
+  rows: T[],
+  rowNumbers: number[],
+  insertFn: (batch: T[]) => Promise<R[]>,
+): Promise<{ created: R[]; errors: string[] }> {
+  const created: R[] = [];
+  const errors: string[] = [];
+
+  for (let start = 0; start < rows.length; start += IMPORT_BATCH_SIZE) {
+    const batch = rows.slice(start, start + IMPORT_BATCH_SIZE);
+    try {
+      created.push(...(await insertFn(batch)));
+    } catch (batchError) {
+      console.error("Import batch failed, retrying row by row:", batchError);
+      for (let i = 0; i < batch.length; i++) {
+        try {
+          created.push(...(await insertFn([batch[i]])));
+        } catch (error: any) {
+          errors.push(`Row ${rowNumbers[start + i]}: ${error.message}`);
+        }
+      }
+    }
+  }
+
+  return { created, errors };
+}
+
+// QuickBooks chart-of-accounts references used by the AR/AP journal entries.
+// Defined once and shared by every payload rather than rebuilt per line.
+const QB_ACCOUNTS = {
+  accountsReceivable: { value: "13", name: "Accounts Receivable (A/R)" },
+  inventoryAsset: { value: "14", name: "Inventory Asset" },
+  accountsPayable: { value: "18", name: "Accounts Payable (A/P)" },
+  freightIncome: { value: "136", name: "Freight Income" },
+  discountsGiven: { value: "137", name: "Discounts Given" },
+  sales: { value: "1150040052", name: "Sales" },
+} as const;
+
 // Configure multer for file uploads (memory storage) with limits
 const upload = multer({
   storage: multer.memoryStorage(),
@@ -405,6 +452,10 @@ export async function registerRoutes(app: Express): Promise<Server> {
           errors: [] as string[],
         };
 
+        // Validated rows are collected here and inserted in batches below
+        const pendingCustomers: Array<InsertCustomer & { userId: string }> = [];
+        const pendingRowNumbers: number[] = [];
+
         // Process each row
         for (let i = 0; i < data.length; i++) {
           const row: any = data[i];
@@ -444,14 +495,24 @@ export async function registerRoutes(app: Express): Promise<Server> {
               continue;
             }
 
-            await storage.createCustomer(validation.data);
-            results.success++;
+            pendingCustomers.push(validation.data);
+            pendingRowNumbers.push(i + 2);
           } catch (error: any) {
             results.failed++;
             results.errors.push(`Row ${i + 2}: ${error.message}`);
           }
         }
 
+        // Insert validated rows in batches rather than one INSERT per row
+        const { created, errors } = await insertInBatches(
+          pendingCustomers,
+          pendingRowNumbers,
+          (batch) => storage.createCustomers(batch),
+        );
+        results.success += created.length;
+        results.failed += errors.length;
+        results.errors.push(...errors);
+
         res.json({
           message: `Import completed: ${results.success} succeeded, ${results.failed} failed`,
           ...results,
@@ -508,6 +569,58 @@ export async function registerRoutes(app: Express): Promise<Server> {
     }
   });
 
+  // Bulk create products (inventory Excel import) in one request
+  app.post("/api/products/bulk", isAuthenticated, async (req, res) => {
+    try {
+      const rows = req.body?.products;
+      if (!Array.isArray(rows)) {
+        return res.status(400).json({ message: "Products array is required" });
+      }
+
+      console.log(`Bulk creating ${rows.length} products`);
+
+      const user = (req as any).user;
+      const validProducts: Array<InsertProduct & { userId: string }> = [];
+      const validRowNumbers: number[] = [];
+      const errors: string[] = [];
+      let errorCount = 0;
+
+      rows.forEach((row: any, i: number) => {
+        const validation = insertProductSchema.safeParse(row);
+        if (!validation.success) {
+          errors.push(
+            `Row ${i + 1} (${row?.name || "unnamed"}): ${validation.error.errors.map((e) => e.message).join(", ")}`,
+          );
+          errorCount++;
+          return;
+        }
+        validProducts.push({ ...validation.data, userId: user.userId });
+        validRowNumbers.push(i + 1);
+      });
+
+      // Insert validated rows in batches rather than one INSERT per product
+      const { created: createdProducts, errors: insertErrors } =
+        await insertInBatches(validProducts, validRowNumbers, (batch) =>
+          storage.createProducts(batch),
+        );
+      errorCount += insertErrors.length;
+      errors.push(...insertErrors);
+
+      res.json({
+        products: createdProducts,
+        successCount: createdProducts.length,
+        errorCount,
+        errors,
+      });
+    } catch (error) {
+      console.error("Bulk product creation error:", error);
+      const err = error as any;
+      res
+        .status(500)
+        .json({ message: "Failed to create products", error: err.message });
+    }
+  });
+
   app.put("/api/products/:id", async (req, res) => {
     try {
       console.log("Updating product with data:", req.body);
@@ -607,8 +720,10 @@ export async function registerRoutes(app: Express): Promise<Server> {
   app.get("/api/schemes", isAuthenticated, async (req, res) => {
     try {
       const user = (req as any).user;
-      const schemes = await storage.getProductSchemes(user.userId);
-      const usageCounts = await storage.getSchemeUsageCounts(user.userId);
+      const [schemes, usageCounts] = await Promise.all([
+        storage.getProductSchemes(user.userId),
+        storage.getSchemeUsageCounts(user.userId),
+      ]);
 
       const schemesWithCounts = schemes.map((scheme) => ({
         ...scheme,
@@ -680,6 +795,27 @@ export async function registerRoutes(app: Express): Promise<Server> {
     }
   });
 
+  // Loads every product referenced by the given line items with one query, for
+  // the stock check, names and prices. Quantities are never written from this
+  // snapshot: stock changes go through storage.adjustProductQty as SQL deltas.
+  async function loadLineItemProducts(
+    items: Array<{ productId?: string | null }>,
+  ) {
+    const productIds = Array.from(
+      new Set(
+        items
+          .map((item) => item.productId)
+          .filter((id): id is string => !!id && id.trim() !== ""),
+      ),
+    );
+    return new Map(
+      (await storage.getProductsByIds(productIds)).map((product) => [
+        product.id,
+        product,
+      ]),
+    );
+  }
+
   // Invoice routes
   app.get("/api/invoices", isAuthenticated, async (req, res) => {
     try {
@@ -727,6 +863,8 @@ export async function registerRoutes(app: Express): Promise<Server> {
         userId: user.userId,
       };
 
+      const lineItemProducts = await loadLineItemProducts(lineItems);
+
       // Check inventory for AR invoices before creating
       if (invoice.invoiceType === "receivable") {
         const outOfStockProducts = [];
@@ -734,7 +872,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
         for (const item of lineItems) {
           if (item.productId && item.productId.trim() !== "") {
             try {
-              const product = await storage.getProduct(item.productId);
+              const product = lineItemProducts.get(item.productId);
               if (product && product.qty === 0) {
                 outOfStockProducts.push(product.name);
               }
@@ -759,10 +897,13 @@ export async function registerRoutes(app: Express): Promise<Server> {
       const createdInvoice = await storage.createInvoice(invoiceData);
 
       // Create line items with scheme application
-      const createdLineItems = [];
+      const pendingLineItems: InsertInvoiceLineItem[] = [];
       const hasFrontendFreeItems = lineItems.some(
         (li: any) => li.isFreeFromScheme,
       );
+      const schemes = hasFrontendFreeItems
+        ? []
+        : await storage.getProductSchemes(user.userId);
 
       for (const item of lineItems) {
         // Skip line items with empty productId
@@ -777,14 +918,10 @@ export async function registerRoutes(app: Express): Promise<Server> {
         });
 
         if (lineItemValidation.success) {
-          const lineItem = await storage.createLineItem(
-            lineItemValidation.data,
-          );
-          createdLineItems.push(lineItem);
+          pendingLineItems.push(lineItemValidation.data);
 
           // Check for applicable schemes only if no frontend free items exist
           if (item.productId && !hasFrontendFreeItems) {
-            const schemes = await storage.getProductSchemes(user.userId);
             const applicableScheme = schemes.find(
               (scheme) =>
                 scheme.productId === item.productId &&
@@ -797,7 +934,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
                 Math.floor(item.quantity / applicableScheme.buyQuantity) *
                 applicableScheme.freeQuantity;
               if (freeQuantity > 0) {
-                const freeLineItem = await storage.createLineItem({
+                pendingLineItems.push({
                   invoiceId: createdInvoice.id,
                   productId: item.productId,
                   variantId: item.variantId,
@@ -809,7 +946,6 @@ export async function registerRoutes(app: Express): Promise<Server> {
                   schemeId: applicableScheme.id,
                   category: item.category,
                 });
-                createdLineItems.push(freeLineItem);
               }
             }
           }
@@ -823,49 +959,47 @@ export async function registerRoutes(app: Express): Promise<Server> {
         }
       }
 
+      // Insert all line items, free scheme items included, in one statement
+      const createdLineItems = await storage.createLineItems(pendingLineItems);
+
       // Update inventory based on invoice type
       for (const item of lineItems) {
         if (item.productId && item.productId.trim() !== "") {
           try {
-            const currentProduct = await storage.getProduct(item.productId);
+            const currentProduct = lineItemProducts.get(item.productId);
             if (currentProduct) {
-              let newQty = currentProduct.qty;
-
               // AR Invoice (receivable): Reduce inventory (selling to customer)
               if (invoice.invoiceType === "receivable") {
-                newQty = Math.max(0, currentProduct.qty - item.quantity);
+                const updatedProduct = await storage.adjustProductQty(
+                  item.productId,
+                  -item.quantity,
+                );
                 console.log(
-                  `Reducing inventory for product ${currentProduct.name}: ${currentProduct.qty} → ${newQty} (sold ${item.quantity})`,
+                  `Reducing inventory for product ${currentProduct.name}: now ${updatedProduct?.qty} (sold ${item.quantity})`,
                 );
               }
               // AP Invoice (payable): Increase inventory (buying from supplier)
               else if (invoice.invoiceType === "payable") {
-                newQty = currentProduct.qty + item.quantity;
-                console.log(
-                  `Increasing inventory for product ${currentProduct.name}: ${currentProduct.qty} → ${newQty} (purchased ${item.quantity})`,
-                );
-                
                 // Update Base Price if the rate is different from current Base Price
                 const newRate = parseFloat(item.unitPrice);
                 const currentBasePrice = parseFloat(currentProduct.basePrice);
-                
+                const priceUpdate =
+                  newRate !== currentBasePrice ? { basePrice: item.unitPrice } : {};
+
                 if (newRate !== currentBasePrice) {
                   console.log(
                     `Updating Base Price for product ${currentProduct.name}: $${currentBasePrice.toFixed(2)} → $${newRate.toFixed(2)}`,
                   );
-                  await storage.updateProduct(item.productId, { 
-                    qty: newQty,
-                    basePrice: item.unitPrice 
-                  });
-                } else {
-                  // Base Price unchanged, only update quantity
-                  await storage.updateProduct(item.productId, { qty: newQty });
                 }
-                continue; // Skip the default update below
+                const updatedProduct = await storage.adjustProductQty(
+                  item.productId,
+                  item.quantity,
+                  priceUpdate,
+                );
+                console.log(
+                  `Increasing inventory for product ${currentProduct.name}: now ${updatedProduct?.qty} (purchased ${item.quantity})`,
+                );
               }
-
-              // Update the product quantity (for AR invoices)
-              await storage.updateProduct(item.productId, { qty: newQty });
             }
           } catch (inventoryError) {
             console.error(
@@ -885,16 +1019,15 @@ export async function registerRoutes(app: Express): Promise<Server> {
           invoice.invoiceType === "receivable"
         ) {
           try {
-            const currentProduct = await storage.getProduct(lineItem.productId);
+            const currentProduct = lineItemProducts.get(lineItem.productId);
             if (currentProduct) {
-              const newQty = Math.max(
-                0,
-                currentProduct.qty - lineItem.quantity,
+              const updatedProduct = await storage.adjustProductQty(
+                lineItem.productId,
+                -lineItem.quantity,
               );
               console.log(
-                `Reducing inventory for free scheme item ${currentProduct.name}: ${currentProduct.qty} → ${newQty} (free quantity ${lineItem.quantity})`,
+                `Reducing inventory for free scheme item ${currentProduct.name}: now ${updatedProduct?.qty} (free quantity ${lineItem.quantity})`,
               );
-              await storage.updateProduct(lineItem.productId, { qty: newQty });
             }
           } catch (inventoryError) {
             console.error(
@@ -939,25 +1072,29 @@ export async function registerRoutes(app: Express): Promise<Server> {
   app.delete("/api/invoices/:id", isAuthenticated, async (req, res) => {
     try {
       // Get invoice and line items before deletion for inventory adjustment
-      const invoice = await storage.getInvoice(req.params.id);
+      const [invoice, lineItems] = await Promise.all([
+        storage.getInvoice(req.params.id),
+        storage.getInvoiceLineItems(req.params.id),
+      ]);
       if (!invoice) {
         return res.status(404).json({ message: "Invoice not found" });
       }
-
-      const lineItems = await storage.getInvoiceLineItems(req.params.id);
+      const lineItemProducts = await loadLineItemProducts(lineItems);
 
       // Revert inventory changes for AP invoices (subtract added quantity)
       if (invoice.invoiceType === "payable") {
         for (const item of lineItems) {
           if (item.productId && item.productId.trim() !== "") {
             try {
-              const currentProduct = await storage.getProduct(item.productId);
+              const currentProduct = lineItemProducts.get(item.productId);
               if (currentProduct) {
-                const newQty = Math.max(0, currentProduct.qty - item.quantity);
+                const updatedProduct = await storage.adjustProductQty(
+                  item.productId,
+                  -item.quantity,
+                );
                 console.log(
-                  `Reverting AP invoice deletion: Reducing inventory for product ${currentProduct.name}: ${currentProduct.qty} → ${newQty} (removing ${item.quantity})`,
+                  `Reverting AP invoice deletion: Reducing inventory for product ${currentProduct.name}: now ${updatedProduct?.qty} (removing ${item.quantity})`,
                 );
-                await storage.updateProduct(item.productId, { qty: newQty });
               }
             } catch (inventoryError) {
               console.error(
@@ -974,13 +1111,15 @@ export async function registerRoutes(app: Express): Promise<Server> {
         for (const item of lineItems) {
           if (item.productId && item.productId.trim() !== "") {
             try {
-              const currentProduct = await storage.getProduct(item.productId);
+              const currentProduct = lineItemProducts.get(item.productId);
               if (currentProduct) {
-                const newQty = currentProduct.qty + item.quantity;
+                const updatedProduct = await storage.adjustProductQty(
+                  item.productId,
+                  item.quantity,
+                );
                 console.log(
-                  `Reverting AR invoice deletion: Increasing inventory for product ${currentProduct.name}: ${currentProduct.qty} → ${newQty} (adding back ${item.quantity})`,
+                  `Reverting AR invoice deletion: Increasing inventory for product ${currentProduct.name}: now ${updatedProduct?.qty} (adding back ${item.quantity})`,
                 );
-                await storage.updateProduct(item.productId, { qty: newQty });
               }
             } catch (inventoryError) {
               console.error(
@@ -1040,33 +1179,35 @@ export async function registerRoutes(app: Express): Promise<Server> {
           .json({ message: "Invoice and line items are required" });
       }
 
-      // Get existing invoice to check if it exists
-      const existingInvoice = await storage.getInvoice(invoiceId);
+      // Get existing invoice (to check it exists) and its line items for
+      // inventory adjustment; the two reads are independent
+      const [existingInvoice, existingLineItems] = await Promise.all([
+        storage.getInvoice(invoiceId),
+        storage.getInvoiceLineItems(invoiceId),
+      ]);
       if (!existingInvoice) {
         return res.status(404).json({ message: "Invoice not found" });
       }
-
-      // Get existing line items for inventory adjustment
-      const existingLineItems = await storage.getInvoiceLineItems(invoiceId);
+      const lineItemProducts = await loadLineItemProducts([
+        ...existingLineItems,
+        ...lineItems,
+      ]);
 
       // For AP invoices, revert old inventory changes before applying new ones
       if (existingInvoice.invoiceType === "payable") {
         for (const oldItem of existingLineItems) {
           if (oldItem.productId && oldItem.productId.trim() !== "") {
             try {
-              const currentProduct = await storage.getProduct(
-                oldItem.productId,
-              );
+              const currentProduct = lineItemProducts.get(oldItem.productId);
               if (currentProduct) {
                 // Subtract the old quantity
-                const newQty = Math.max(
-                  0,
-                  currentProduct.qty - oldItem.quantity,
+                const updatedProduct = await storage.adjustProductQty(
+                  oldItem.productId,
+                  -oldItem.quantity,
                 );
                 console.log(
-                  `Reverting old AP line item: Reducing inventory for product ${currentProduct.name}: ${currentProduct.qty} → ${newQty} (removing ${oldItem.quantity})`,
+                  `Reverting old AP line item: Reducing inventory for product ${currentProduct.name}: now ${updatedProduct?.qty} (removing ${oldItem.quantity})`,
                 );
-                await storage.updateProduct(oldItem.productId, { qty: newQty });
               }
             } catch (inventoryError) {
               console.error(
@@ -1083,16 +1224,16 @@ export async function registerRoutes(app: Express): Promise<Server> {
         for (const oldItem of existingLineItems) {
           if (oldItem.productId && oldItem.productId.trim() !== "") {
             try {
-              const currentProduct = await storage.getProduct(
-                oldItem.productId,
-              );
+              const currentProduct = lineItemProducts.get(oldItem.productId);
               if (currentProduct) {
                 // Add back the old quantity
-                const newQty = currentProduct.qty + oldItem.quantity;
+                const updatedProduct = await storage.adjustProductQty(
+                  oldItem.productId,
+                  oldItem.quantity,
+                );
                 console.log(
-                  `Reverting old AR line item: Increasing inventory for product ${currentProduct.name}: ${currentProduct.qty} → ${newQty} (adding back ${oldItem.quantity})`,
+                  `Reverting old AR line item: Increasing inventory for product ${currentProduct.name}: now ${updatedProduct?.qty} (adding back ${oldItem.quantity})`,
                 );
-                await storage.updateProduct(oldItem.productId, { qty: newQty });
               }
             } catch (inventoryError) {
               console.error(
@@ -1125,7 +1266,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
       // Delete existing line items and create new ones
       await storage.deleteInvoiceLineItemsByInvoiceId(invoiceId);
 
-      const createdLineItems = [];
+      const pendingLineItems: InsertInvoiceLineItem[] = [];
       for (const item of lineItems) {
         if (!item.productId || item.productId.trim() === "") {
           console.log("Skipping line item with empty productId:", item);
@@ -1138,10 +1279,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
         });
 
         if (lineItemValidation.success) {
-          const lineItem = await storage.createLineItem(
-            lineItemValidation.data,
-          );
-          createdLineItems.push(lineItem);
+          pendingLineItems.push(lineItemValidation.data);
         } else {
           console.error(
             "Line item validation failed:",
@@ -1152,35 +1290,36 @@ export async function registerRoutes(app: Express): Promise<Server> {
         }
       }
 
+      const createdLineItems = await storage.createLineItems(pendingLineItems);
+
       // Apply new inventory changes for AP invoices
       if (invoiceData.invoiceType === "payable") {
         for (const item of lineItems) {
           if (item.productId && item.productId.trim() !== "") {
             try {
-              const currentProduct = await storage.getProduct(item.productId);
+              const currentProduct = lineItemProducts.get(item.productId);
               if (currentProduct) {
-                // Add the new quantity
-                const newQty = currentProduct.qty + item.quantity;
-                console.log(
-                  `Applying new AP line item: Increasing inventory for product ${currentProduct.name}: ${currentProduct.qty} → ${newQty} (adding ${item.quantity})`,
-                );
-                
                 // Update Base Price if the rate is different from current Base Price
                 const newRate = parseFloat(item.unitPrice);
                 const currentBasePrice = parseFloat(currentProduct.basePrice);
-                
+                const priceUpdate =
+                  newRate !== currentBasePrice ? { basePrice: item.unitPrice } : {};
+
                 if (newRate !== currentBasePrice) {
                   console.log(
                     `Updating Base Price for product ${currentProduct.name}: $${currentBasePrice.toFixed(2)} → $${newRate.toFixed(2)}`,
                   );
-                  await storage.updateProduct(item.productId, { 
-                    qty: newQty,
-                    basePrice: item.unitPrice 
-                  });
-                } else {
-                  // Base Price unchanged, only update quantity
-                  await storage.updateProduct(item.productId, { qty: newQty });
                 }
+
+                // Add the new quantity
+                const updatedProduct = await storage.adjustProductQty(
+                  item.productId,
+                  item.quantity,
+                  priceUpdate,
+                );
+                console.log(
+                  `Applying new AP line item: Increasing inventory for product ${currentProduct.name}: now ${updatedProduct?.qty} (adding ${item.quantity})`,
+                );
               }
             } catch (inventoryError) {
               console.error(
@@ -1197,14 +1336,16 @@ export async function registerRoutes(app: Express): Promise<Server> {
         for (const item of lineItems) {
           if (item.productId && item.productId.trim() !== "") {
             try {
-              const currentProduct = await storage.getProduct(item.productId);
+              const currentProduct = lineItemProducts.get(item.productId);
               if (currentProduct) {
                 // Subtract the new quantity
-                const newQty = Math.max(0, currentProduct.qty - item.quantity);
+                const updatedProduct = await storage.adjustProductQty(
+                  item.productId,
+                  -item.quantity,
+                );
                 console.log(
-                  `Applying new AR line item: Reducing inventory for product ${currentProduct.name}: ${currentProduct.qty} → ${newQty} (removing ${item.quantity})`,
+                  `Applying new AR line item: Reducing inventory for product ${currentProduct.name}: now ${updatedProduct?.qty} (removing ${item.quantity})`,
                 );
-                await storage.updateProduct(item.productId, { qty: newQty });
               }
             } catch (inventoryError) {
               console.error(
@@ -1245,79 +1386,33 @@ export async function registerRoutes(app: Express): Promise<Server> {
         // Ensure tokens are valid and refresh if needed
         const validQbConfig = await ensureValidTokens();
 
-        // Step 1: Try to find existing customer by DisplayName
+        // Step 1: Find the customer by DisplayName or create it, sharing any
+        // in-flight resolution of the same name
         console.log(`Attempting to sync customer: "${customer.name}"`);
 
-        let qbCustomer;
+        let resolution;
         try {
-          qbCustomer = await quickBooksService.findCustomerByDisplayName(
-            validQbConfig.accessToken,
-            validQbConfig.companyId,
-            customer.name,
-          );
-
-          if (qbCustomer) {
-            console.log(`Found existing customer in QuickBooks:`, {
-              Id: qbCustomer.Id,
-              DisplayName: qbCustomer.DisplayName,
-              Name: qbCustomer.Name,
-            });
-          }
-        } catch (lookupError: any) {
+          resolution = await resolveCustomer(validQbConfig, customer.name);
+        } catch (createError: any) {
           console.error(
-            "Customer lookup failed:",
-            lookupError.response?.data || lookupError.message,
+            "Customer creation failed:",
+            createError.response?.data || createError.message,
           );
           console.error(
-            "Lookup error details:",
-            JSON.stringify(lookupError.response?.data, null, 2),
+            "Creation error details:",
+            JSON.stringify(createError.response?.data, null, 2),
           );
-          // Continue to creation if lookup fails
-          qbCustomer = null;
-        }
-
-        // Step 2: If customer doesn't exist, create it
-        if (!qbCustomer) {
-          console.log(
-            `Customer "${customer.name}" not found in QuickBooks. Creating new customer...`,
-          );
-
-          const qbCustomerData = {
-            DisplayName: customer.name,
-          };
-
-          try {
-            qbCustomer = await quickBooksService.createCustomer(
-              validQbConfig.accessToken,
-              validQbConfig.companyId,
-              qbCustomerData,
-            );
-
-            console.log(`Successfully created new customer in QuickBooks:`, {
-              Id: qbCustomer.Id,
-              DisplayName: qbCustomer.DisplayName,
-              Name: qbCustomer.Name,
-            });
-          } catch (createError: any) {
-            console.error(
-              "Customer creation failed:",
-              createError.response?.data || createError.message,
-            );
-            console.error(
-              "Creation error details:",
-              JSON.stringify(createError.response?.data, null, 2),
-            );
-            const errorMessage =
-              createError.response?.data?.Fault?.Error?.[0]?.Detail ||
-              createError.response?.data?.Fault?.Error?.[0]?.code ||
-              "Failed to create customer in QuickBooks";
-            return res
-              .status(500)
-              .json({ message: errorMessage, action: "create" });
-          }
+          const errorMessage =
+            createError.response?.data?.Fault?.Error?.[0]?.Detail ||
+            createError.response?.data?.Fault?.Error?.[0]?.code ||
+            "Failed to create customer in QuickBooks";
+          return res
+            .status(500)
+            .json({ message: errorMessage, action: "create" });
         }
+        const qbCustomer = resolution.entity;
 
-        // Step 3: Update local customer record with QuickBooks ID
+        // Step 2: Update local customer record with QuickBooks ID
         await storage.updateCustomer(customer.id, {
           quickbooksCustomerId: qbCustomer.Id,
         });
@@ -1325,7 +1420,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
         res.json({
           success: true,
           quickbooksCustomerId: qbCustomer.Id,
-          action: qbCustomer.Name === customer.name ? "found" : "created",
+          action: resolution.created ? "created" : "found",
           displayName: qbCustomer.DisplayName,
         });
       } catch (error: unknown) {
@@ -1399,6 +1494,10 @@ export async function registerRoutes(app: Express): Promise<Server> {
     },
   );
 
+  // In-flight token refresh, shared so concurrent requests that find the token
+  // expiring trigger a single refresh instead of racing each other
+  let tokenRefresh: Promise<any> | null = null;
+
   // Helper function to ensure valid QuickBooks tokens (system-wide)
   async function ensureValidTokens() {
     const qbConfig = await storage.getSystemSetting("quickbooks_config");
@@ -1409,42 +1508,69 @@ export async function registerRoutes(app: Express): Promise<Server> {
       );
     }
 
-    // Check if token is expired (expires in 1 hour, refresh if less than 5 minutes left)
+    if (tokenExpiresSoon(qbConfig)) {
+      if (!tokenRefresh) {
+        tokenRefresh = refreshTokens().finally(() => {
+          tokenRefresh = null;
+        });
+      }
+      return tokenRefresh;
+    }
+
+    return qbConfig;
+  }
+
+  // Check the stored expiry locally (refresh if less than 5 minutes left)
+  function tokenExpiresSoon(qbConfig: any) {
     const tokenExpiry = qbConfig.tokenExpiry
       ? new Date(qbConfig.tokenExpiry)
       : new Date(0);
-    const now = new Date();
-    const timeUntilExpiry = tokenExpiry.getTime() - now.getTime();
-    const fiveMinutes = 5 * 60 * 1000;
-
-    if (timeUntilExpiry < fiveMinutes) {
-      console.log("QuickBooks token expired or expiring soon, refreshing...");
-      try {
-        const refreshedTokens = await quickBooksService.refreshAccessToken(
-          qbConfig.refreshToken,
-        );
+    return tokenExpiry.getTime() - Date.now() < 5 * 60 * 1000;
+  }
 
-        // Update system settings with new tokens
-        const expiryTime = new Date(now.getTime() + 3600 * 1000); // 1 hour from now
-        const updatedConfig = {
-          ...qbConfig,
-          accessToken: refreshedTokens.accessToken,
-          refreshToken: refreshedTokens.refreshToken,
-          tokenExpiry: expiryTime,
-        };
-        await storage.setSystemSetting("quickbooks_config", updatedConfig);
-
-        console.log("QuickBooks tokens refreshed successfully");
-        return updatedConfig;
-      } catch (tokenError) {
-        console.error("Failed to refresh QuickBooks tokens:", tokenError);
-        throw new Error(
-          "QuickBooks token refresh failed. Please reconnect to QuickBooks.",
-        );
-      }
+  async function refreshTokens() {
+    // The stored config is the token store shared by every server instance,
+    // and another instance may have refreshed (or disconnected) since this one
+    // cached it. Re-read it past the cache so a fresh token is reused, a
+    // rotated refresh token is never replayed and a disconnect is respected.
+    const qbConfig = await storage.getSystemSetting("quickbooks_config", {
+      bypassCache: true,
+    });
+    if (!qbConfig || !qbConfig.refreshToken) {
+      throw new Error(
+        "No refresh token available. Please reconnect to QuickBooks.",
+      );
+    }
+    if (!tokenExpiresSoon(qbConfig)) {
+      return qbConfig;
     }
 
-    return qbConfig;
+    console.log("QuickBooks token expired or expiring soon, refreshing...");
+    try {
+      const refreshedTokens = await quickBooksService.refreshAccessToken(
+        qbConfig.refreshToken,
+      );
+
+      // Update system settings with new tokens
+      // Use the lifetime QuickBooks reports, falling back to its usual 1 hour
+      const expiresIn = refreshedTokens.expiresIn || 3600;
+      const expiryTime = new Date(Date.now() + expiresIn * 1000);
+      const updatedConfig = {
+        ...qbConfig,
+        accessToken: refreshedTokens.accessToken,
+        refreshToken: refreshedTokens.refreshToken,
+        tokenExpiry: expiryTime,
+      };
+      await storage.setSystemSetting("quickbooks_config", updatedConfig);
+
+      console.log("QuickBooks tokens refreshed successfully");
+      return updatedConfig;
+    } catch (tokenError) {
+      console.error("Failed to refresh QuickBooks tokens:", tokenError);
+      throw new Error(
+        "QuickBooks token refresh failed. Please reconnect to QuickBooks.",
+      );
+    }
   }
 
   app.post(
@@ -1533,8 +1659,8 @@ export async function registerRoutes(app: Express): Promise<Server> {
       `Creating QuickBooks Journal Entry for AP invoice ${invoice.invoiceNumber}`,
     );
 
-    // Find or create vendor in QuickBooks
-    const customer = await storage.getCustomer(invoice.customerId!);
+    // Find or create vendor in QuickBooks (storage.getInvoice already joined the customer record)
+    const customer = invoice.customer;
     if (!customer) {
       return res
         .status(400)
@@ -1548,21 +1674,19 @@ export async function registerRoutes(app: Express): Promise<Server> {
       storage,
     );
 
-    // Get invoice line items to calculate total
-    const lineItems = await storage.getInvoiceLineItems(invoice.id);
-
     console.log("AP Invoice data:", {
       id: invoice.id,
       total: invoice.total,
       invoiceNumber: invoice.invoiceNumber,
     });
-    console.log("AP Line items for amount calculation:", lineItems);
 
     // Calculate total from invoice total first, then fallback to line items
     let totalAmount = parseFloat(invoice.total) || 0;
 
-    // If invoice total is 0, calculate from line items
+    // If invoice total is 0, calculate from line items (only loaded in that case)
     if (totalAmount === 0) {
+      const lineItems = await storage.getInvoiceLineItems(invoice.id);
+      console.log("AP Line items for amount calculation:", lineItems);
       totalAmount = lineItems.reduce((sum: number, item: any) => {
         const itemTotal = parseFloat(item.lineTotal) || 0;
         console.log(`AP Line item ${item.description}: ${itemTotal}`);
@@ -1592,10 +1716,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           DetailType: "JournalEntryLineDetail",
           JournalEntryLineDetail: {
             PostingType: "Debit",
-            AccountRef: {
-              value: "14",
-              name: "Inventory Asset",
-            },
+            AccountRef: QB_ACCOUNTS.inventoryAsset,
           },
         },
         // Credit Account Payable with Vendor entity reference
@@ -1606,10 +1727,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           DetailType: "JournalEntryLineDetail",
           JournalEntryLineDetail: {
             PostingType: "Credit",
-            AccountRef: {
-              value: "18",
-              name: "Accounts Payable (A/P)",
-            },
+            AccountRef: QB_ACCOUNTS.accountsPayable,
             Entity: {
               Type: "Vendor",
               EntityRef: {
@@ -1622,11 +1740,6 @@ export async function registerRoutes(app: Express): Promise<Server> {
       ],
     };
 
-    console.log(
-      "Creating AP QuickBooks Journal Entry with data:",
-      JSON.stringify(journalEntryData, null, 2),
-    );
-
     // Call QuickBooks API to create journal entry
     const qbJournalEntry = await quickBooksService.createJournalEntry(
       qbConfig.accessToken,
@@ -1661,20 +1774,31 @@ export async function registerRoutes(app: Express): Promise<Server> {
       `${isUpdate ? "Updating" : "Creating"} QuickBooks Journal Entry for AR invoice ${invoice.invoiceNumber}`,
     );
 
-    // Find or create customer in QuickBooks
-    const customer = await storage.getCustomer(invoice.customerId!);
+    // Find or create customer in QuickBooks (storage.getInvoice already joined the customer record)
+    const customer = invoice.customer;
     if (!customer) {
       return res
         .status(400)
         .json({ message: "Customer not found for this AR invoice" });
     }
 
-    const qbCustomer = await findOrCreateCustomer(
-      qbConfig,
-      customer.name,
-      customer.id,
-      storage,
-    );
+    // On update we also need the existing journal entry (for its SyncToken).
+    // It doesn't depend on the customer lookup, so fetch both concurrently.
+    if (isUpdate) {
+      console.log(
+        `Retrieving existing journal entry ${invoice.quickbooksInvoiceId} for update`,
+      );
+    }
+    const [qbCustomer, existingJE] = await Promise.all([
+      findOrCreateCustomer(qbConfig, customer.name, customer.id, storage),
+      isUpdate
+        ? quickBooksService.getJournalEntry(
+            qbConfig.accessToken,
+            qbConfig.companyId,
+            invoice.quickbooksInvoiceId,
+          )
+        : Promise.resolve(null),
+    ]);
 
     // Get amounts from invoice
     const subtotal = parseFloat(invoice.subtotal) || 0;
@@ -1713,10 +1837,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
       DetailType: "JournalEntryLineDetail",
       JournalEntryLineDetail: {
         PostingType: "Debit",
-        AccountRef: {
-          value: "13",
-          name: "Accounts Receivable (A/R)",
-        },
+        AccountRef: QB_ACCOUNTS.accountsReceivable,
         Entity: {
           Type: "Customer",
           EntityRef: {
@@ -1736,10 +1857,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
         DetailType: "JournalEntryLineDetail",
         JournalEntryLineDetail: {
           PostingType: "Debit",
-          AccountRef: {
-            value: "137",
-            name: "Discounts Given",
-          },
+          AccountRef: QB_ACCOUNTS.discountsGiven,
         },
       });
     }
@@ -1753,10 +1871,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
       DetailType: "JournalEntryLineDetail",
       JournalEntryLineDetail: {
         PostingType: "Credit",
-        AccountRef: {
-          value: "1150040052",
-          name: "Sales",
-        },
+        AccountRef: QB_ACCOUNTS.sales,
       },
     });
 
@@ -1769,10 +1884,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
         DetailType: "JournalEntryLineDetail",
         JournalEntryLineDetail: {
           PostingType: "Credit",
-          AccountRef: {
-            value: "136",
-            name: "Freight Income",
-          },
+          AccountRef: QB_ACCOUNTS.freightIncome,
         },
       });
     }
@@ -1781,16 +1893,6 @@ export async function registerRoutes(app: Express): Promise<Server> {
     let qbJournalEntry;
 
     if (isUpdate) {
-      // Get existing journal entry to retrieve SyncToken
-      console.log(
-        `Retrieving existing journal entry ${invoice.quickbooksInvoiceId} for update`,
-      );
-      const existingJE = await quickBooksService.getJournalEntry(
-        qbConfig.accessToken,
-        qbConfig.companyId,
-        invoice.quickbooksInvoiceId,
-      );
-
       const journalEntryData = {
         Id: existingJE.Id,
         SyncToken: existingJE.SyncToken,
@@ -1799,11 +1901,6 @@ export async function registerRoutes(app: Express): Promise<Server> {
         Line: journalLines,
       };
 
-      console.log(
-        "Updating QuickBooks Journal Entry with data:",
-        JSON.stringify(journalEntryData, null, 2),
-      );
-
       qbJournalEntry = await quickBooksService.updateJournalEntry(
         qbConfig.accessToken,
         qbConfig.companyId,
@@ -1816,11 +1913,6 @@ export async function registerRoutes(app: Express): Promise<Server> {
         Line: journalLines,
       };
 
-      console.log(
-        "Creating QuickBooks Journal Entry with data:",
-        JSON.stringify(journalEntryData, null, 2),
-      );
-
       qbJournalEntry = await quickBooksService.createJournalEntry(
         qbConfig.accessToken,
         qbConfig.companyId,
@@ -1855,6 +1947,43 @@ export async function registerRoutes(app: Express): Promise<Server> {
     });
   }
 
+  // In-flight QuickBooks customer/vendor resolutions keyed by entity type,
+  // company and case-folded DisplayName (the name QuickBooks keeps unique), so
+  // concurrent syncs in this process that need the same name share one
+  // lookup/create instead of each creating it
+  const pendingPartyResolutions = new Map<
+    string,
+    Promise<{ entity: any; created: boolean }>
+  >();
+
+  function singleFlightParty(
+    key: string,
+    resolve: () => Promise<{ entity: any; created: boolean }>,
+  ) {
+    let pending = pendingPartyResolutions.get(key);
+    if (!pending) {
+      pending = resolve().finally(() => {
+        pendingPartyResolutions.delete(key);
+      });
+      pendingPartyResolutions.set(key, pending);
+    }
+    return pending;
+  }
+
+  function resolveCustomer(qbConfig: any, customerName: string) {
+    return singleFlightParty(
+      `customer:${qbConfig.companyId}:${customerName.toLowerCase()}`,
+      () => lookupOrCreateCustomer(qbConfig, customerName),
+    );
+  }
+
+  function resolveVendor(qbConfig: any, vendorName: string) {
+    return singleFlightParty(
+      `vendor:${qbConfig.companyId}:${vendorName.toLowerCase()}`,
+      () => lookupOrCreateVendor(qbConfig, vendorName),
+    );
+  }
+
   // Helper function to find or create customer
   async function findOrCreateCustomer(
     qbConfig: any,
@@ -1862,9 +1991,45 @@ export async function registerRoutes(app: Express): Promise<Server> {
     customerId: string,
     storage: any,
   ) {
-    let qbCustomer;
+    const { entity: qbCustomer, created } = await resolveCustomer(
+      qbConfig,
+      customerName,
+    );
+
+    // Update local customer record with QuickBooks ID
+    if (created) {
+      await storage.updateCustomer(customerId, {
+        quickbooksCustomerId: qbCustomer.Id,
+      });
+    }
+
+    return qbCustomer;
+  }
+
+  async function findOrCreateVendor(
+    qbConfig: any,
+    vendorName: string,
+    customerId: string,
+    storage: any,
+  ) {
+    const { entity: qbVendor, created } = await resolveVendor(
+      qbConfig,
+      vendorName,
+    );
+
+    // Update local customer record with QuickBooks Vendor ID (for AP invoices, customer record holds vendor info)
+    if (created) {
+      await storage.updateCustomer(customerId, {
+        quickbooksCustomerId: qbVendor.Id, // Store vendor ID in same field for AP invoices
+      });
+    }
+
+    return qbVendor;
+  }
+
+  async function lookupOrCreateCustomer(qbConfig: any, customerName: string) {
     try {
-      qbCustomer = await quickBooksService.findCustomerByDisplayName(
+      const qbCustomer = await quickBooksService.findCustomerByDisplayName(
         qbConfig.accessToken,
         qbConfig.companyId,
         customerName,
@@ -1875,7 +2040,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           Id: qbCustomer.Id,
           DisplayName: qbCustomer.DisplayName,
         });
-        return qbCustomer;
+        return { entity: qbCustomer, created: false };
       }
     } catch (lookupError: any) {
       console.error(
@@ -1890,29 +2055,18 @@ export async function registerRoutes(app: Express): Promise<Server> {
       DisplayName: customerName,
     };
 
-    qbCustomer = await quickBooksService.createCustomer(
+    const qbCustomer = await quickBooksService.createCustomer(
       qbConfig.accessToken,
       qbConfig.companyId,
       qbCustomerData,
     );
 
-    // Update local customer record with QuickBooks ID
-    await storage.updateCustomer(customerId, {
-      quickbooksCustomerId: qbCustomer.Id,
-    });
-
-    return qbCustomer;
+    return { entity: qbCustomer, created: true };
   }
 
-  async function findOrCreateVendor(
-    qbConfig: any,
-    vendorName: string,
-    customerId: string,
-    storage: any,
-  ) {
-    let qbVendor;
+  async function lookupOrCreateVendor(qbConfig: any, vendorName: string) {
     try {
-      qbVendor = await quickBooksService.findVendorByDisplayName(
+      const qbVendor = await quickBooksService.findVendorByDisplayName(
         qbConfig.accessToken,
         qbConfig.companyId,
         vendorName,
@@ -1923,7 +2077,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           Id: qbVendor.Id,
           DisplayName: qbVendor.DisplayName,
         });
-        return qbVendor;
+        return { entity: qbVendor, created: false };
       }
     } catch (lookupError: any) {
       console.error(
@@ -1938,18 +2092,13 @@ export async function registerRoutes(app: Express): Promise<Server> {
       DisplayName: vendorName,
     };
 
-    qbVendor = await quickBooksService.createVendor(
+    const qbVendor = await quickBooksService.createVendor(
       qbConfig.accessToken,
       qbConfig.companyId,
       qbVendorData,
     );
 
-    // Update local customer record with QuickBooks Vendor ID (for AP invoices, customer record holds vendor info)
-    await storage.updateCustomer(customerId, {
-      quickbooksCustomerId: qbVendor.Id, // Store vendor ID in same field for AP invoices
-    });
-
-    return qbVendor;
+    return { entity: qbVendor, created: true };
   }
 
   // Debug endpoint to list QuickBooks accounts
@@ -1993,53 +2142,11 @@ export async function registerRoutes(app: Express): Promise<Server> {
   // Dashboard stats
   app.get("/api/dashboard/stats", isAuthenticated, async (req, res) => {
     try {
-      // Use authenticated user ID from JWT token (global data visibility)
-      const userId = (req as any).user?.userId;
-
-      // Fetch all global data (storage methods now return all data)
-      const invoices = await storage.getInvoices(userId);
-      const products = await storage.getProducts(userId);
-      const schemes = await storage.getProductSchemes(userId);
-
-      // Calculate total revenue from AR (receivable) invoices only
-      const receivableInvoices = invoices.filter((invoice) => invoice.invoiceType === "receivable");
-      const totalRevenue = receivableInvoices.reduce((sum, invoice) => sum + parseFloat(invoice.total), 0);
-      console.log(`[STATS] AR Invoices: ${receivableInvoices.length}, Total Revenue: $${totalRevenue.toFixed(2)}`);
-
-      // Calculate total purchase from AP (payable) invoices only
-      const payableInvoices = invoices.filter((invoice) => invoice.invoiceType === "payable");
-      const totalPurchase = payableInvoices.reduce((sum, invoice) => sum + parseFloat(invoice.total), 0);
-      console.log(`[STATS] AP Invoices: ${payableInvoices.length}, Total Purchase: $${totalPurchase.toFixed(2)}`);
-
-      // Count active invoices (sent or draft status)
-      const activeInvoices = invoices.filter(
-        (invoice) => invoice.status === "sent" || invoice.status === "draft",
-      ).length;
-
-      // Count products in stock using product.qty field
-      let totalStock = 0;
-      let lowStockCount = 0;
-
-      for (const product of products) {
-        const qty = product.qty || 0;
-        totalStock += qty;
-        // Count as low stock if quantity is 10 or less
-        if (qty <= 10 && qty > 0) {
-          lowStockCount++;
-        }
-      }
-
-      // Count active schemes
-      const activeSchemes = schemes.filter((scheme) => scheme.isActive).length;
-
-      res.json({
-        totalRevenue: totalRevenue.toFixed(2),
-        totalPurchase: totalPurchase.toFixed(2),
-        activeInvoices,
-        productsInStock: totalStock,
-        lowStockCount,
-        activeSchemes,
-      });
+      const stats = await storage.getDashboardStats();
+      console.log(
+        `[STATS] Total Revenue: $${stats.totalRevenue}, Total Purchase: $${stats.totalPurchase}`,
+      );
+      res.json(stats);
     } catch (error) {
       console.error("Error fetching dashboard stats:", error);
       res.status(500).json({ message: "Failed to fetch dashboard stats" });
@@ -2052,18 +2159,8 @@ export async function registerRoutes(app: Express): Promise<Server> {
     isAuthenticated,
     async (req, res) => {
       try {
-        // Use authenticated user ID from JWT token (global data visibility)
-        const userId = (req as any).user?.userId;
-
-        const invoices = await storage.getInvoices(userId);
-
-        // Count unique invoices with posted journal entries (non-null quickbooksInvoiceId)
-        const journalEntryCount = invoices.filter(
-          (invoice) =>
-            invoice.quickbooksInvoiceId !== null &&
-            invoice.quickbooksInvoiceId !== undefined &&
-            invoice.quickbooksInvoiceId !== "",
-        ).length;
+        // Count unique invoices with posted journal entries (non-empty quickbooksInvoiceId)
+        const journalEntryCount = await storage.getSyncedInvoiceCount();
 
         res.json({ count: journalEntryCount });
       } catch (error) {
@@ -1,4 +1,6 @@
-import axios from 'axios';
+import axios, { type AxiosInstance, type AxiosRequestConfig, type AxiosResponse } from 'axios';
+import { Agent } from 'https';
+import { randomUUID } from 'crypto';
 
 export interface QuickBooksTokens {
   accessToken: string;
@@ -39,6 +41,41 @@ export interface QuickBooksBillData {
   }>;
 }
 
+// Backoff policy for throttled (429) and transient server (5xx) responses
+const MAX_RETRIES = 4;
+const BASE_RETRY_DELAY_MS = 500;
+const MAX_RETRY_DELAY_MS = 30_000;
+// Pinned API minor version so QuickBooks returns a stable response shape
+const QUICKBOOKS_MINOR_VERSION = '75';
+// Socket-level failures where the request may never have reached QuickBooks
+const RETRYABLE_NETWORK_ERRORS = new Set(['ECONNRESET', 'ETIMEDOUT', 'ECONNREFUSED', 'EAI_AGAIN', 'EPIPE']);
+
+const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// With the minor version pinned, single-entity create/read/update responses
+// always come back as { <EntityType>: {...}, time }
+const extractEntity = (response: AxiosResponse, entityType: string): any =>
+  response.data?.[entityType];
+
+// Wraps a failed call in a descriptive error, keeping the axios response (status
+// and QuickBooks Fault body) for the routes' error handling
+const quickBooksError = (message: string, error: any): Error =>
+  Object.assign(new Error(message), { response: error?.response });
+
+// Full request/response payloads are only logged with QUICKBOOKS_DEBUG=true,
+// so normal syncs skip serialising them altogether
+const DEBUG_PAYLOADS = process.env.QUICKBOOKS_DEBUG === 'true';
+
+const logPayload = (message: string, payload: unknown) => {
+  if (DEBUG_PAYLOADS) {
+    console.log(message, JSON.stringify(payload));
+  }
+};
+
+// Customer/vendor lookups by name repeat heavily during bulk syncs
+const ENTITY_CACHE_TTL_MS = 5 * 60 * 1000;
+const ENTITY_CACHE_MAX_SIZE = 2048;
+
 export class QuickBooksService {
   private readonly clientId: string;
   private readonly clientSecret: string;
@@ -47,18 +84,133 @@ export class QuickBooksService {
   private readonly productionBaseUrl = 'https://quickbooks.api.intuit.com';
   private readonly oauthBaseUrl = 'https://oauth.platform.intuit.com';
   private readonly isProduction: boolean;
+  // Keep-alive agent so consecutive QuickBooks calls reuse the TCP/TLS
+  // connection instead of paying a new handshake on every request
+  private readonly httpsAgent = new Agent({ keepAlive: true, maxSockets: 20 });
+  private readonly api: AxiosInstance;
+  private readonly oauth: AxiosInstance;
+  private readonly entityCache = new Map<string, { entity: any; expiresAt: number }>();
 
   constructor() {
     this.clientId = process.env.QUICKBOOKS_CLIENT_ID || '';
     this.clientSecret = process.env.QUICKBOOKS_CLIENT_SECRET || '';
     this.redirectUri = process.env.QUICKBOOKS_REDIRECT_URI || '';
     this.isProduction = process.env.QUICKBOOKS_ENVIRONMENT === 'production';
+    this.api = axios.create({
+      baseURL: this.getBaseUrl(),
+      httpsAgent: this.httpsAgent,
+      headers: { Accept: 'application/json' },
+    });
+    // Token endpoint calls share the same pooled agent as the API calls
+    this.oauth = axios.create({
+      baseURL: this.oauthBaseUrl,
+      httpsAgent: this.httpsAgent,
+      headers: {
+        Authorization: `Basic ${Buffer.from(`${this.clientId}:${this.clientSecret}`).toString('base64')}`,
+        'Content-Type': 'application/x-www-form-urlencoded',
+        Accept: 'application/json',
+      },
+    });
+    // Every call pins the minor version. QuickBooks also de-duplicates writes
+    // that carry the same requestid, so tagging each POST once (retries reuse
+    // the config) makes it safe to repeat
+    this.api.interceptors.request.use((config) => {
+      config.params = { minorversion: QUICKBOOKS_MINOR_VERSION, ...config.params };
+      if (config.method === 'post' && !config.params.requestid) {
+        config.params.requestid = randomUUID();
+      }
+      return config;
+    });
+    this.api.interceptors.response.use(undefined, (error) => this.retryTransientError(error));
+  }
+
+  // Retries 429s, 5xx responses and dropped connections. Writes are idempotent
+  // through their requestid, so this applies to POSTs as well as GETs. Waits for
+  // Retry-After when given, otherwise backs off exponentially with jitter so
+  // concurrent syncs don't retry in lockstep. Anything else is rethrown as-is.
+  private async retryTransientError(error: any): Promise<any> {
+    const config = error.config;
+    const status = error.response?.status;
+    const isRetryable = status === 429 || status >= 500 ||
+      (!error.response && RETRYABLE_NETWORK_ERRORS.has(error.code));
+    const attempt = config?.retryCount ?? 0;
+    if (!config || !isRetryable || attempt >= MAX_RETRIES) {
+      throw error;
+    }
+
+    const retryAfterSeconds = Number(error.response?.headers?.['retry-after']);
+    const delay = retryAfterSeconds > 0
+      ? Math.min(retryAfterSeconds * 1000, MAX_RETRY_DELAY_MS)
+      : Math.min(BASE_RETRY_DELAY_MS * 2 ** attempt, MAX_RETRY_DELAY_MS) * (0.5 + Math.random() / 2);
+
+    console.warn(
+      `QuickBooks ${config.method?.toUpperCase()} ${config.url} failed with ${status ?? error.code}, ` +
+      `retrying in ${Math.round(delay)}ms (attempt ${attempt + 1}/${MAX_RETRIES})`
+    );
+    config.retryCount = attempt + 1;
+    await sleep(delay);
+    return this.api.request(config);
+  }
+
+  private entityCacheKey(entityType: string, companyId: string, name: string): string {
+    return `${entityType}:${companyId}:${name.toLowerCase()}`;
+  }
+
+  private getCachedEntity(entityType: string, companyId: string, name: string): any {
+    const key = this.entityCacheKey(entityType, companyId, name);
+    const cached = this.entityCache.get(key);
+    if (!cached) return undefined;
+    if (cached.expiresAt <= Date.now()) {
+      this.entityCache.delete(key);
+      return undefined;
+    }
+    return cached.entity;
+  }
+
+  // Only entities QuickBooks actually returned with an Id are cached, so a
+  // miss is always re-checked against the API
+  private cacheEntity(entityType: string, companyId: string, name: string | undefined, entity: any): void {
+    if (!name || !entity?.Id) return;
+    if (this.entityCache.size >= ENTITY_CACHE_MAX_SIZE) {
+      // Maps iterate in insertion order, so the first key is the oldest entry
+      const oldestKey = this.entityCache.keys().next().value;
+      if (oldestKey !== undefined) this.entityCache.delete(oldestKey);
+    }
+    this.entityCache.set(this.entityCacheKey(entityType, companyId, name), {
+      entity,
+      expiresAt: Date.now() + ENTITY_CACHE_TTL_MS,
+    });
   }
 
   private getBaseUrl(): string {
     return this.isProduction ? this.productionBaseUrl : this.sandboxBaseUrl;
   }
 
+  private companyPath(companyId: string, endpoint: string): string {
+    return `/v3/company/${companyId}/${endpoint}`;
+  }
+
+  // Static headers live on the client; only the bearer token varies per call.
+  // axios sets Content-Type: application/json itself for object bodies.
+  private authConfig(accessToken: string): AxiosRequestConfig {
+    return { headers: { Authorization: `Bearer ${accessToken}` } };
+  }
+
+  // Quotes a value for a QuickBooks query; backslashes and single quotes are
+  // backslash-escaped, as the query language does not accept doubled quotes
+  private quoteQueryValue(value: string): string {
+    return `'${value.replace(/\\/g, '\\\\').replace(/'/g, "\\'")}'`;
+  }
+
+  // Every query goes through here so the statement is always URL-encoded
+  private async runQuery(accessToken: string, companyId: string, statement: string): Promise<any> {
+    const response = await this.api.get(
+      this.companyPath(companyId, `query?query=${encodeURIComponent(statement)}`),
+      this.authConfig(accessToken)
+    );
+    return response.data.QueryResponse || {};
+  }
+
   getAuthorizationUrl(state: string): string {
     const scope = 'com.intuit.quickbooks.accounting';
     const params = new URLSearchParams({
@@ -82,15 +234,9 @@ export class QuickBooksService {
         redirect_uri: this.redirectUri,
       };
 
-      const response = await axios.post(
-        `${this.oauthBaseUrl}/oauth2/v1/tokens/bearer`,
-        new URLSearchParams(tokenData),
-        {
-          headers: {
-            Authorization: `Basic ${Buffer.from(`${this.clientId}:${this.clientSecret}`).toString('base64')}`,
-            'Content-Type': 'application/x-www-form-urlencoded',
-          },
-        }
+      const response = await this.oauth.post(
+        '/oauth2/v1/tokens/bearer',
+        new URLSearchParams(tokenData)
       );
 
       return {
@@ -109,37 +255,32 @@ export class QuickBooksService {
       
       // Preserve the actual error from QuickBooks API
       const qbError = error.response?.data?.error || error.response?.data?.error_description || error.message;
-      const enhancedError = new Error(qbError || 'Failed to exchange code for tokens');
-      (enhancedError as any).response = error.response;
-      throw enhancedError;
+      throw quickBooksError(qbError || 'Failed to exchange code for tokens', error);
     }
   }
 
-  async refreshAccessToken(refreshToken: string): Promise<{ accessToken: string; refreshToken: string }> {
+  async refreshAccessToken(
+    refreshToken: string
+  ): Promise<{ accessToken: string; refreshToken: string; expiresIn: number }> {
     try {
       const tokenData = {
         grant_type: 'refresh_token',
         refresh_token: refreshToken,
       };
 
-      const response = await axios.post(
-        `${this.oauthBaseUrl}/oauth2/v1/tokens/bearer`,
-        new URLSearchParams(tokenData),
-        {
-          headers: {
-            Authorization: `Basic ${Buffer.from(`${this.clientId}:${this.clientSecret}`).toString('base64')}`,
-            'Content-Type': 'application/x-www-form-urlencoded',
-          },
-        }
+      const response = await this.oauth.post(
+        '/oauth2/v1/tokens/bearer',
+        new URLSearchParams(tokenData)
       );
 
       return {
         accessToken: response.data.access_token,
         refreshToken: response.data.refresh_token,
+        expiresIn: response.data.expires_in,
       };
-    } catch (error) {
-      console.error('QuickBooks token refresh failed:', error);
-      throw new Error('Failed to refresh access token');
+    } catch (error: any) {
+      console.error('QuickBooks token refresh failed:', error.response?.data || error.message);
+      throw quickBooksError('Failed to refresh access token', error);
     }
   }
 
@@ -149,21 +290,15 @@ export class QuickBooksService {
     invoiceData: QuickBooksInvoiceData
   ): Promise<any> {
     try {
-      console.log('Creating QuickBooks AR invoice with data:', JSON.stringify(invoiceData, null, 2));
+      logPayload('Creating QuickBooks AR invoice with data:', invoiceData);
       
-      const response = await axios.post(
-        `${this.getBaseUrl()}/v3/company/${companyId}/invoice`,
+      const response = await this.api.post(
+        this.companyPath(companyId, 'invoice'),
         invoiceData,
-        {
-          headers: {
-            Authorization: `Bearer ${accessToken}`,
-            'Content-Type': 'application/json',
-            Accept: 'application/json',
-          },
-        }
+        this.authConfig(accessToken)
       );
 
-      const invoice = response.data.QueryResponse?.Invoice?.[0] || response.data.Invoice;
+      const invoice = extractEntity(response, 'Invoice');
       console.log('Successfully created QuickBooks AR invoice:', {
         Id: invoice?.Id,
         DocNumber: invoice?.DocNumber,
@@ -173,16 +308,8 @@ export class QuickBooksService {
       return invoice;
     } catch (error: any) {
       console.error('QuickBooks AR invoice creation failed:', error.response?.data || error.message);
-      console.error('Request data that failed:', JSON.stringify(invoiceData, null, 2));
-      
-      // Preserve the original error structure for better error handling
-      if (error.response) {
-        const enhancedError = new Error('Failed to create AR invoice in QuickBooks');
-        (enhancedError as any).response = error.response;
-        throw enhancedError;
-      }
-      
-      throw new Error('Failed to create AR invoice in QuickBooks');
+      console.error('Request data that failed:', JSON.stringify(invoiceData));
+      throw quickBooksError('Failed to create AR invoice in QuickBooks', error);
     }
   }
 
@@ -192,21 +319,15 @@ export class QuickBooksService {
     billData: QuickBooksBillData
   ): Promise<any> {
     try {
-      console.log('Creating QuickBooks AP bill with data:', JSON.stringify(billData, null, 2));
+      logPayload('Creating QuickBooks AP bill with data:', billData);
       
-      const response = await axios.post(
-        `${this.getBaseUrl()}/v3/company/${companyId}/bill`,
+      const response = await this.api.post(
+        this.companyPath(companyId, 'bill'),
         billData,
-        {
-          headers: {
-            Authorization: `Bearer ${accessToken}`,
-            'Content-Type': 'application/json',
-            Accept: 'application/json',
-          },
-        }
+        this.authConfig(accessToken)
       );
 
-      const bill = response.data.QueryResponse?.Bill?.[0] || response.data.Bill;
+      const bill = extractEntity(response, 'Bill');
       console.log('Successfully created QuickBooks AP bill:', {
         Id: bill?.Id,
         DocNumber: bill?.DocNumber,
@@ -216,35 +337,22 @@ export class QuickBooksService {
       return bill;
     } catch (error: any) {
       console.error('QuickBooks AP bill creation failed:', error.response?.data || error.message);
-      console.error('Request data that failed:', JSON.stringify(billData, null, 2));
-      
-      // Preserve the original error structure for better error handling
-      if (error.response) {
-        const enhancedError = new Error('Failed to create AP bill in QuickBooks');
-        (enhancedError as any).response = error.response;
-        throw enhancedError;
-      }
-      
-      throw new Error('Failed to create AP bill in QuickBooks');
+      console.error('Request data that failed:', JSON.stringify(billData));
+      throw quickBooksError('Failed to create AP bill in QuickBooks', error);
     }
   }
 
   async getCompanyInfo(accessToken: string, companyId: string): Promise<any> {
     try {
-      const response = await axios.get(
-        `${this.getBaseUrl()}/v3/company/${companyId}/companyinfo/${companyId}`,
-        {
-          headers: {
-            Authorization: `Bearer ${accessToken}`,
-            Accept: 'application/json',
-          },
-        }
+      const response = await this.api.get(
+        this.companyPath(companyId, `companyinfo/${companyId}`),
+        this.authConfig(accessToken)
       );
 
-      return response.data.QueryResponse?.CompanyInfo?.[0];
-    } catch (error) {
-      console.error('QuickBooks company info fetch failed:', error);
-      throw new Error('Failed to fetch company info from QuickBooks');
+      return extractEntity(response, 'CompanyInfo');
+    } catch (error: any) {
+      console.error('QuickBooks company info fetch failed:', error.response?.data || error.message);
+      throw quickBooksError('Failed to fetch company info from QuickBooks', error);
     }
   }
 
@@ -254,109 +362,81 @@ export class QuickBooksService {
     customerData: any
   ): Promise<any> {
     try {
-      console.log('Creating QuickBooks customer with data:', JSON.stringify(customerData, null, 2));
+      logPayload('Creating QuickBooks customer with data:', customerData);
       
-      const response = await axios.post(
-        `${this.getBaseUrl()}/v3/company/${companyId}/customer`,
+      const response = await this.api.post(
+        this.companyPath(companyId, 'customer'),
         customerData,
-        {
-          headers: {
-            Authorization: `Bearer ${accessToken}`,
-            'Content-Type': 'application/json',
-            Accept: 'application/json',
-          },
-        }
+        this.authConfig(accessToken)
       );
 
-      const customer = response.data.QueryResponse?.Customer?.[0] || response.data.Customer;
+      const customer = extractEntity(response, 'Customer');
       console.log('Successfully created QuickBooks customer:', {
         Id: customer?.Id,
         DisplayName: customer?.DisplayName,
         Name: customer?.Name
       });
-      
+      this.cacheEntity('Customer', companyId, customer?.DisplayName, customer);
+
       return customer;
     } catch (error: any) {
       console.error('QuickBooks customer creation failed:', error.response?.data || error.message);
-      console.error('Request data that failed:', JSON.stringify(customerData, null, 2));
-      
-      // Preserve the original error structure for better error handling
-      if (error.response) {
-        const enhancedError = new Error('Failed to create customer in QuickBooks');
-        (enhancedError as any).response = error.response;
-        throw enhancedError;
-      }
-      
-      throw new Error('Failed to create customer in QuickBooks');
+      console.error('Request data that failed:', JSON.stringify(customerData));
+      throw quickBooksError('Failed to create customer in QuickBooks', error);
     }
   }
 
   async findVendorByDisplayName(accessToken: string, companyId: string, vendorName: string): Promise<any> {
-    try {
-      // First try exact DisplayName match for vendors
-      const escapedName = vendorName.replace(/'/g, "''");
-      
-      console.log(`Searching for vendor with DisplayName: "${vendorName}"`);
-      
-      const response = await axios.get(
-        `${this.getBaseUrl()}/v3/company/${companyId}/query?query=SELECT * FROM Vendor WHERE DisplayName = '${escapedName}'`,
-        {
-          headers: {
-            Authorization: `Bearer ${accessToken}`,
-            Accept: 'application/json',
-          },
-        }
-      );
-
-      const vendors = response.data.QueryResponse?.Vendor || [];
-      if (vendors.length > 0) {
-        console.log(`Found vendor by exact DisplayName match:`, {
-          Id: vendors[0].Id,
-          DisplayName: vendors[0].DisplayName,
-          Name: vendors[0].Name
-        });
-        return vendors[0];
-      }
-
-      console.log('Exact DisplayName match failed, trying case-insensitive search...');
-      
-      // If exact match fails, try to get all vendors and find by DisplayName
-      const allVendorsResponse = await axios.get(
-        `${this.getBaseUrl()}/v3/company/${companyId}/query?query=SELECT * FROM Vendor`,
-        {
-          headers: {
-            Authorization: `Bearer ${accessToken}`,
-            Accept: 'application/json',
-          },
-        }
-      );
-
-      const allVendors = allVendorsResponse.data.QueryResponse?.Vendor || [];
-      console.log(`Found ${allVendors.length} total vendors, searching for: "${vendorName}"`);
-      
-      // Try to find vendor by DisplayName (case insensitive)
-      const matchingVendor = allVendors.find((vendor: any) => 
-        vendor.DisplayName?.toLowerCase() === vendorName.toLowerCase()
-      );
-      
-      if (matchingVendor) {
-        console.log(`Found vendor by case-insensitive DisplayName match:`, {
-          Id: matchingVendor.Id,
-          DisplayName: matchingVendor.DisplayName,
-          Name: matchingVendor.Name
-        });
-        return matchingVendor;
-      }
+    const cached = this.getCachedEntity('Vendor', companyId, vendorName);
+    if (cached) return cached;
+
+    // First try exact DisplayName match for vendors
+    console.log(`Searching for vendor with DisplayName: "${vendorName}"`);
+
+    const { Vendor: vendors = [] } = await this.runQuery(
+      accessToken,
+      companyId,
+      `SELECT * FROM Vendor WHERE DisplayName = ${this.quoteQueryValue(vendorName)}`
+    );
+    if (vendors.length > 0) {
+      console.log(`Found vendor by exact DisplayName match:`, {
+        Id: vendors[0].Id,
+        DisplayName: vendors[0].DisplayName,
+        Name: vendors[0].Name
+      });
+      this.cacheEntity('Vendor', companyId, vendorName, vendors[0]);
+      return vendors[0];
+    }
 
-      console.log('No vendor found with DisplayName matching approach');
-      console.log('Available vendor DisplayNames:', allVendors.map((v: any) => v.DisplayName).slice(0, 10));
-      return null;
-      
-    } catch (error: any) {
-      console.error('QuickBooks vendor search failed:', error.response?.data || error.message);
-      console.error('Full error details:', JSON.stringify(error.response?.data, null, 2));
-      throw error; // Throw error so calling code can handle it appropriately
+    console.log('Exact DisplayName match failed, trying case-insensitive search...');
+    
+    // If exact match fails, try to get all vendors and find by DisplayName.
+    // Only the fields callers use are selected, which keeps this list small.
+    const { Vendor: allVendors = [] } = await this.runQuery(
+      accessToken,
+      companyId,
+      'SELECT Id, DisplayName FROM Vendor'
+    );
+    console.log(`Found ${allVendors.length} total vendors, searching for: "${vendorName}"`);
+    
+    // Try to find vendor by DisplayName (case insensitive)
+    const matchingVendor = allVendors.find((vendor: any) => 
+      vendor.DisplayName?.toLowerCase() === vendorName.toLowerCase()
+    );
+    
+    if (matchingVendor) {
+      console.log(`Found vendor by case-insensitive DisplayName match:`, {
+        Id: matchingVendor.Id,
+        DisplayName: matchingVendor.DisplayName,
+        Name: matchingVendor.Name
+      });
+      this.cacheEntity('Vendor', companyId, vendorName, matchingVendor);
+      return matchingVendor;
     }
+
+    console.log('No vendor found with DisplayName matching approach');
+    console.log('Available vendor DisplayNames:', allVendors.map((v: any) => v.DisplayName).slice(0, 10));
+    return null;
   }
 
   async createVendor(
@@ -365,40 +445,27 @@ export class QuickBooksService {
     vendorData: any
   ): Promise<any> {
     try {
-      console.log('Creating QuickBooks vendor with data:', JSON.stringify(vendorData, null, 2));
+      logPayload('Creating QuickBooks vendor with data:', vendorData);
       
-      const response = await axios.post(
-        `${this.getBaseUrl()}/v3/company/${companyId}/vendor`,
+      const response = await this.api.post(
+        this.companyPath(companyId, 'vendor'),
         vendorData,
-        {
-          headers: {
-            Authorization: `Bearer ${accessToken}`,
-            'Content-Type': 'application/json',
-            Accept: 'application/json',
-          },
-        }
+        this.authConfig(accessToken)
       );
 
-      const vendor = response.data.QueryResponse?.Vendor?.[0] || response.data.Vendor;
+      const vendor = extractEntity(response, 'Vendor');
       console.log('Successfully created QuickBooks vendor:', {
         Id: vendor?.Id,
         DisplayName: vendor?.DisplayName,
         Name: vendor?.Name
       });
-      
+      this.cacheEntity('Vendor', companyId, vendor?.DisplayName, vendor);
+
       return vendor;
     } catch (error: any) {
       console.error('QuickBooks vendor creation failed:', error.response?.data || error.message);
-      console.error('Request data that failed:', JSON.stringify(vendorData, null, 2));
-      
-      // Preserve the original error structure for better error handling
-      if (error.response) {
-        const enhancedError = new Error('Failed to create vendor in QuickBooks');
-        (enhancedError as any).response = error.response;
-        throw enhancedError;
-      }
-      
-      throw new Error('Failed to create vendor in QuickBooks');
+      console.error('Request data that failed:', JSON.stringify(vendorData));
+      throw quickBooksError('Failed to create vendor in QuickBooks', error);
     }
   }
 
@@ -408,22 +475,16 @@ export class QuickBooksService {
     itemData: any
   ): Promise<any> {
     try {
-      const response = await axios.post(
-        `${this.getBaseUrl()}/v3/company/${companyId}/item`,
+      const response = await this.api.post(
+        this.companyPath(companyId, 'item'),
         itemData,
-        {
-          headers: {
-            Authorization: `Bearer ${accessToken}`,
-            'Content-Type': 'application/json',
-            Accept: 'application/json',
-          },
-        }
+        this.authConfig(accessToken)
       );
 
-      return response.data.QueryResponse?.Item?.[0];
-    } catch (error) {
-      console.error('QuickBooks item creation failed:', error);
-      throw new Error('Failed to create item in QuickBooks');
+      return extractEntity(response, 'Item');
+    } catch (error: any) {
+      console.error('QuickBooks item creation failed:', error.response?.data || error.message);
+      throw quickBooksError('Failed to create item in QuickBooks', error);
     }
   }
 
@@ -436,17 +497,7 @@ export class QuickBooksService {
 
       while (hasMore) {
         const query = `SELECT * FROM Account WHERE Active = true STARTPOSITION ${startPosition} MAXRESULTS ${maxResults}`;
-        const response = await axios.get(
-          `${this.getBaseUrl()}/v3/company/${companyId}/query?query=${encodeURIComponent(query)}`,
-          {
-            headers: {
-              Authorization: `Bearer ${accessToken}`,
-              Accept: 'application/json',
-            },
-          }
-        );
-
-        const accounts = response.data.QueryResponse?.Account || [];
+        const { Account: accounts = [] } = await this.runQuery(accessToken, companyId, query);
         allAccounts.push(...accounts);
 
         // Check if there are more results
@@ -458,117 +509,88 @@ export class QuickBooksService {
       }
 
       return allAccounts;
-    } catch (error) {
-      console.error('QuickBooks accounts fetch failed:', error);
-      throw new Error('Failed to fetch accounts from QuickBooks');
+    } catch (error: any) {
+      console.error('QuickBooks accounts fetch failed:', error.response?.data || error.message);
+      throw quickBooksError('Failed to fetch accounts from QuickBooks', error);
     }
   }
 
   async findCustomerByDisplayName(accessToken: string, companyId: string, customerName: string): Promise<any> {
-    try {
-      // First try exact DisplayName match (this is what QuickBooks uses for customer matching)
-      const escapedName = customerName.replace(/'/g, "''");
-      
-      console.log(`Searching for customer with DisplayName: "${customerName}"`);
-      
-      const response = await axios.get(
-        `${this.getBaseUrl()}/v3/company/${companyId}/query?query=SELECT * FROM Customer WHERE DisplayName = '${escapedName}'`,
-        {
-          headers: {
-            Authorization: `Bearer ${accessToken}`,
-            Accept: 'application/json',
-          },
-        }
-      );
-
-      const customers = response.data.QueryResponse?.Customer || [];
-      if (customers.length > 0) {
-        console.log(`Found customer by exact DisplayName match:`, {
-          Id: customers[0].Id,
-          DisplayName: customers[0].DisplayName,
-          Name: customers[0].Name
-        });
-        return customers[0];
-      }
-
-      console.log('Exact DisplayName match failed, trying case-insensitive search...');
-      
-      // If exact match fails, try to get all customers and find by DisplayName
-      const allCustomersResponse = await axios.get(
-        `${this.getBaseUrl()}/v3/company/${companyId}/query?query=SELECT * FROM Customer`,
-        {
-          headers: {
-            Authorization: `Bearer ${accessToken}`,
-            Accept: 'application/json',
-          },
-        }
-      );
-
-      const allCustomers = allCustomersResponse.data.QueryResponse?.Customer || [];
-      console.log(`Found ${allCustomers.length} total customers, searching for: "${customerName}"`);
-      
-      // Try to find customer by DisplayName (case insensitive)
-      const matchingCustomer = allCustomers.find((customer: any) => 
-        customer.DisplayName?.toLowerCase() === customerName.toLowerCase()
-      );
-      
-      if (matchingCustomer) {
-        console.log(`Found customer by case-insensitive DisplayName match:`, {
-          Id: matchingCustomer.Id,
-          DisplayName: matchingCustomer.DisplayName,
-          Name: matchingCustomer.Name
-        });
-        return matchingCustomer;
-      }
+    const cached = this.getCachedEntity('Customer', companyId, customerName);
+    if (cached) return cached;
+
+    // First try exact DisplayName match (this is what QuickBooks uses for customer matching)
+    console.log(`Searching for customer with DisplayName: "${customerName}"`);
+
+    const { Customer: customers = [] } = await this.runQuery(
+      accessToken,
+      companyId,
+      `SELECT * FROM Customer WHERE DisplayName = ${this.quoteQueryValue(customerName)}`
+    );
+    if (customers.length > 0) {
+      console.log(`Found customer by exact DisplayName match:`, {
+        Id: customers[0].Id,
+        DisplayName: customers[0].DisplayName,
+        Name: customers[0].Name
+      });
+      this.cacheEntity('Customer', companyId, customerName, customers[0]);
+      return customers[0];
+    }
 
-      console.log('No customer found with DisplayName matching approach');
-      console.log('Available customer DisplayNames:', allCustomers.map((c: any) => c.DisplayName).slice(0, 10));
-      return null;
-      
-    } catch (error: any) {
-      console.error('QuickBooks customer search failed:', error.response?.data || error.message);
-      console.error('Full error details:', JSON.stringify(error.response?.data, null, 2));
-      throw error; // Throw error so calling code can handle it appropriately
+    console.log('Exact DisplayName match failed, trying case-insensitive search...');
+    
+    // If exact match fails, try to get all customers and find by DisplayName.
+    // Only the fields callers use are selected, which keeps this list small.
+    const { Customer: allCustomers = [] } = await this.runQuery(
+      accessToken,
+      companyId,
+      'SELECT Id, DisplayName FROM Customer'
+    );
+    console.log(`Found ${allCustomers.length} total customers, searching for: "${customerName}"`);
+    
+    // Try to find customer by DisplayName (case insensitive)
+    const matchingCustomer = allCustomers.find((customer: any) => 
+      customer.DisplayName?.toLowerCase() === customerName.toLowerCase()
+    );
+    
+    if (matchingCustomer) {
+      console.log(`Found customer by case-insensitive DisplayName match:`, {
+        Id: matchingCustomer.Id,
+        DisplayName: matchingCustomer.DisplayName,
+        Name: matchingCustomer.Name
+      });
+      this.cacheEntity('Customer', companyId, customerName, matchingCustomer);
+      return matchingCustomer;
     }
+
+    console.log('No customer found with DisplayName matching approach');
+    console.log('Available customer DisplayNames:', allCustomers.map((c: any) => c.DisplayName).slice(0, 10));
+    return null;
   }
 
   async findCustomerByName(accessToken: string, companyId: string, customerName: string): Promise<any> {
     try {
       // First try exact name match
-      const escapedName = customerName.replace(/'/g, "''");
-      
       console.log(`Searching for customer with exact name: "${customerName}"`);
-      
-      const response = await axios.get(
-        `${this.getBaseUrl()}/v3/company/${companyId}/query?query=SELECT * FROM Customer WHERE Name = '${escapedName}'`,
-        {
-          headers: {
-            Authorization: `Bearer ${accessToken}`,
-            Accept: 'application/json',
-          },
-        }
-      );
 
-      const customers = response.data.QueryResponse?.Customer || [];
+      const { Customer: customers = [] } = await this.runQuery(
+        accessToken,
+        companyId,
+        `SELECT * FROM Customer WHERE Name = ${this.quoteQueryValue(customerName)}`
+      );
       if (customers.length > 0) {
-        console.log(`Found customer by exact match:`, customers[0]);
+        logPayload('Found customer by exact match:', customers[0]);
         return customers[0];
       }
 
       console.log('Exact match failed, trying to list all customers...');
       
       // If exact match fails, try to get all customers and find by name
-      const allCustomersResponse = await axios.get(
-        `${this.getBaseUrl()}/v3/company/${companyId}/query?query=SELECT * FROM Customer`,
-        {
-          headers: {
-            Authorization: `Bearer ${accessToken}`,
-            Accept: 'application/json',
-          },
-        }
+      const { Customer: allCustomers = [] } = await this.runQuery(
+        accessToken,
+        companyId,
+        'SELECT * FROM Customer'
       );
-
-      const allCustomers = allCustomersResponse.data.QueryResponse?.Customer || [];
       console.log(`Found ${allCustomers.length} total customers`);
       
       // Try to find customer by name (case insensitive)
@@ -577,7 +599,7 @@ export class QuickBooksService {
       );
       
       if (matchingCustomer) {
-        console.log(`Found customer by case-insensitive match:`, matchingCustomer);
+        logPayload('Found customer by case-insensitive match:', matchingCustomer);
         return matchingCustomer;
       }
 
@@ -588,7 +610,7 @@ export class QuickBooksService {
       );
       
       if (partialMatch) {
-        console.log(`Found customer by partial match:`, partialMatch);
+        logPayload('Found customer by partial match:', partialMatch);
         return partialMatch;
       }
 
@@ -597,7 +619,7 @@ export class QuickBooksService {
       
     } catch (error: any) {
       console.error('QuickBooks customer search failed:', error.response?.data || error.message);
-      console.error('Full error details:', JSON.stringify(error.response?.data, null, 2));
+      console.error('Full error details:', JSON.stringify(error.response?.data));
       return null; // Return null instead of throwing to handle gracefully
     }
   }
@@ -608,34 +630,21 @@ export class QuickBooksService {
     journalEntryData: any
   ): Promise<any> {
     try {
-      console.log('Posting Journal Entry to QuickBooks:', JSON.stringify(journalEntryData, null, 2));
+      logPayload('Posting Journal Entry to QuickBooks:', journalEntryData);
       
-      const response = await axios.post(
-        `${this.getBaseUrl()}/v3/company/${companyId}/journalentry`,
+      const response = await this.api.post(
+        this.companyPath(companyId, 'journalentry'),
         journalEntryData,
-        {
-          headers: {
-            Authorization: `Bearer ${accessToken}`,
-            'Content-Type': 'application/json',
-            Accept: 'application/json',
-          },
-        }
+        this.authConfig(accessToken)
       );
 
-      console.log('QuickBooks Journal Entry Response:', JSON.stringify(response.data, null, 2));
-      return response.data.JournalEntry || response.data.QueryResponse?.JournalEntry?.[0];
+      logPayload('QuickBooks Journal Entry Response:', response.data);
+      return extractEntity(response, 'JournalEntry');
     } catch (error: any) {
       console.error('QuickBooks journal entry creation failed:', error.response?.data || error.message);
-      console.error('Full error details:', JSON.stringify(error.response?.data, null, 2));
-      
-      // Preserve the original error structure for better error handling
-      if (error.response) {
-        const enhancedError = new Error('Failed to create journal entry in QuickBooks');
-        (enhancedError as any).response = error.response;
-        throw enhancedError;
-      }
-      
-      throw new Error('Failed to create journal entry in QuickBooks');
+      console.error('Full error details:', JSON.stringify(error.response?.data));
+      console.error('Request data that failed:', JSON.stringify(journalEntryData));
+      throw quickBooksError('Failed to create journal entry in QuickBooks', error);
     }
   }
 
@@ -647,29 +656,17 @@ export class QuickBooksService {
     try {
       console.log(`Getting Journal Entry ${journalEntryId} from QuickBooks`);
       
-      const response = await axios.get(
-        `${this.getBaseUrl()}/v3/company/${companyId}/journalentry/${journalEntryId}`,
-        {
-          headers: {
-            Authorization: `Bearer ${accessToken}`,
-            Accept: 'application/json',
-          },
-        }
+      const response = await this.api.get(
+        this.companyPath(companyId, `journalentry/${journalEntryId}`),
+        this.authConfig(accessToken)
       );
 
-      console.log('QuickBooks Get Journal Entry Response:', JSON.stringify(response.data, null, 2));
-      return response.data.JournalEntry;
+      logPayload('QuickBooks Get Journal Entry Response:', response.data);
+      return extractEntity(response, 'JournalEntry');
     } catch (error: any) {
       console.error('QuickBooks journal entry get failed:', error.response?.data || error.message);
-      console.error('Full error details:', JSON.stringify(error.response?.data, null, 2));
-      
-      if (error.response) {
-        const enhancedError = new Error('Failed to get journal entry from QuickBooks');
-        (enhancedError as any).response = error.response;
-        throw enhancedError;
-      }
-      
-      throw new Error('Failed to get journal entry from QuickBooks');
+      console.error('Full error details:', JSON.stringify(error.response?.data));
+      throw quickBooksError('Failed to get journal entry from QuickBooks', error);
     }
   }
 
@@ -679,33 +676,21 @@ export class QuickBooksService {
     journalEntryData: any
   ): Promise<any> {
     try {
-      console.log('Updating Journal Entry in QuickBooks:', JSON.stringify(journalEntryData, null, 2));
+      logPayload('Updating Journal Entry in QuickBooks:', journalEntryData);
       
-      const response = await axios.post(
-        `${this.getBaseUrl()}/v3/company/${companyId}/journalentry?operation=update`,
+      const response = await this.api.post(
+        this.companyPath(companyId, 'journalentry?operation=update'),
         journalEntryData,
-        {
-          headers: {
-            Authorization: `Bearer ${accessToken}`,
-            'Content-Type': 'application/json',
-            Accept: 'application/json',
-          },
-        }
+        this.authConfig(accessToken)
       );
 
-      console.log('QuickBooks Journal Entry Update Response:', JSON.stringify(response.data, null, 2));
-      return response.data.JournalEntry;
+      logPayload('QuickBooks Journal Entry Update Response:', response.data);
+      return extractEntity(response, 'JournalEntry');
     } catch (error: any) {
       console.error('QuickBooks journal entry update failed:', error.response?.data || error.message);
-      console.error('Full error details:', JSON.stringify(error.response?.data, null, 2));
-      
-      if (error.response) {
-        const enhancedError = new Error('Failed to update journal entry in QuickBooks');
-        (enhancedError as any).response = error.response;
-        throw enhancedError;
-      }
-      
-      throw new Error('Failed to update journal entry in QuickBooks');
+      console.error('Full error details:', JSON.stringify(error.response?.data));
+      console.error('Request data that failed:', JSON.stringify(journalEntryData));
+      throw quickBooksError('Failed to update journal entry in QuickBooks', error);
     }
   }
 
@@ -4,6 +4,57 @@ import { type User, type InsertUser, type Customer, type InsertCustomer,
          type InvoiceLineItem, type InsertInvoiceLineItem } from "@shared/schema";
 import { randomUUID } from "crypto";
 
+export interface DashboardStats {
+  totalRevenue: string;
+  totalPurchase: string;
+  activeInvoices: number;
+  productsInStock: number;
+  lowStockCount: number;
+  activeSchemes: number;
+}
+
+// Builds dashboard stats from in-memory rows (DatabaseStorage aggregates in SQL instead)
+function summarizeDashboard(
+  invoiceRows: Array<Pick<Invoice, "invoiceType" | "total" | "status">>,
+  productRows: Array<Pick<Product, "qty">>,
+  schemeRows: Array<Pick<ProductScheme, "isActive">>,
+): DashboardStats {
+  let totalRevenue = 0;
+  let totalPurchase = 0;
+  let activeInvoices = 0;
+  for (const invoice of invoiceRows) {
+    // AR (receivable) invoices are revenue, AP (payable) invoices are purchases
+    if (invoice.invoiceType === "receivable") {
+      totalRevenue += parseFloat(invoice.total);
+    } else if (invoice.invoiceType === "payable") {
+      totalPurchase += parseFloat(invoice.total);
+    }
+    if (invoice.status === "sent" || invoice.status === "draft") {
+      activeInvoices++;
+    }
+  }
+
+  let productsInStock = 0;
+  let lowStockCount = 0;
+  for (const product of productRows) {
+    const qty = product.qty || 0;
+    productsInStock += qty;
+    // Count as low stock if quantity is 10 or less
+    if (qty <= 10 && qty > 0) {
+      lowStockCount++;
+    }
+  }
+
+  return {
+    totalRevenue: totalRevenue.toFixed(2),
+    totalPurchase: totalPurchase.toFixed(2),
+    activeInvoices,
+    productsInStock,
+    lowStockCount,
+    activeSchemes: schemeRows.filter((scheme) => scheme.isActive).length,
+  };
+}
+
 export interface IStorage {
   // Users
   getUsers(): Promise<User[]>;
@@ -19,14 +70,18 @@ export interface IStorage {
   getCustomers(userId: string): Promise<Customer[]>;
   getCustomer(id: string): Promise<Customer | undefined>;
   createCustomer(customer: InsertCustomer & { userId: string }): Promise<Customer>;
+  createCustomers(customers: Array<InsertCustomer & { userId: string }>): Promise<Customer[]>;
   updateCustomer(id: string, updates: Partial<Customer>): Promise<Customer | undefined>;
   deleteCustomer(id: string): Promise<boolean>;
 
   // Products
   getProducts(userId: string): Promise<Product[]>;
   getProduct(id: string): Promise<Product | undefined>;
+  getProductsByIds(ids: string[]): Promise<Product[]>;
   createProduct(product: InsertProduct & { userId: string }): Promise<Product>;
+  createProducts(products: Array<InsertProduct & { userId: string }>): Promise<Product[]>;
   updateProduct(id: string, updates: Partial<Product>): Promise<Product | undefined>;
+  adjustProductQty(id: string, delta: number, updates?: Partial<Product>): Promise<Product | undefined>;
   deleteProduct(id: string): Promise<boolean>;
   deleteAllProducts(userId: string): Promise<boolean>;
 
@@ -52,13 +107,18 @@ export interface IStorage {
   updateInvoiceStatus(id: string, status: string): Promise<boolean>;
   deleteInvoice(id: string): Promise<boolean>;
 
+  // Dashboard
+  getDashboardStats(): Promise<DashboardStats>;
+  getSyncedInvoiceCount(): Promise<number>;
+
   // Invoice Line Items
   getInvoiceLineItems(invoiceId: string): Promise<InvoiceLineItem[]>;
   createLineItem(lineItem: InsertInvoiceLineItem): Promise<InvoiceLineItem>;
+  createLineItems(lineItems: InsertInvoiceLineItem[]): Promise<InvoiceLineItem[]>;
   deleteLineItem(id: string): Promise<boolean>;
 
   // System Settings (for system-wide QuickBooks config)
-  getSystemSetting(key: string): Promise<any>;
+  getSystemSetting(key: string, options?: { bypassCache?: boolean }): Promise<any>;
   setSystemSetting(key: string, value: any): Promise<void>;
   deleteSystemSetting(key: string): Promise<boolean>;
 }
@@ -183,6 +243,10 @@ export class MemStorage implements IStorage {
     return customer;
   }
 
+  async createCustomers(customersData: Array<InsertCustomer & { userId: string }>): Promise<Customer[]> {
+    return Promise.all(customersData.map((customerData) => this.createCustomer(customerData)));
+  }
+
   async updateCustomer(id: string, updates: Partial<Customer>): Promise<Customer | undefined> {
     const customer = this.customers.get(id);
     if (!customer) return undefined;
@@ -205,6 +269,10 @@ export class MemStorage implements IStorage {
     return this.products.get(id);
   }
 
+  async getProductsByIds(ids: string[]): Promise<Product[]> {
+    return ids.map((id) => this.products.get(id)).filter((product): product is Product => !!product);
+  }
+
   async createProduct(productData: InsertProduct & { userId: string }): Promise<Product> {
     const id = randomUUID();
     const product: Product = {
@@ -225,6 +293,10 @@ export class MemStorage implements IStorage {
     return product;
   }
 
+  async createProducts(productsData: Array<InsertProduct & { userId: string }>): Promise<Product[]> {
+    return Promise.all(productsData.map((productData) => this.createProduct(productData)));
+  }
+
   async updateProduct(id: string, updates: Partial<Product>): Promise<Product | undefined> {
     const product = this.products.get(id);
     if (!product) return undefined;
@@ -233,6 +305,12 @@ export class MemStorage implements IStorage {
     return updatedProduct;
   }
 
+  async adjustProductQty(id: string, delta: number, updates: Partial<Product> = {}): Promise<Product | undefined> {
+    const product = this.products.get(id);
+    if (!product) return undefined;
+    return this.updateProduct(id, { ...updates, qty: Math.max(0, product.qty + delta) });
+  }
+
   async deleteProduct(id: string): Promise<boolean> {
     return this.products.delete(id);
   }
@@ -345,6 +423,20 @@ export class MemStorage implements IStorage {
     return Array.from(this.invoices.values());
   }
 
+  async getDashboardStats(): Promise<DashboardStats> {
+    return summarizeDashboard(
+      Array.from(this.invoices.values()),
+      Array.from(this.products.values()),
+      Array.from(this.productSchemes.values()),
+    );
+  }
+
+  async getSyncedInvoiceCount(): Promise<number> {
+    return Array.from(this.invoices.values()).filter(
+      (invoice) => !!invoice.quickbooksInvoiceId,
+    ).length;
+  }
+
   async getInvoice(id: string): Promise<Invoice | undefined> {
     const invoice = this.invoices.get(id);
     if (!invoice) return undefined;
@@ -424,6 +516,10 @@ export class MemStorage implements IStorage {
     return lineItem;
   }
 
+  async createLineItems(lineItemsData: InsertInvoiceLineItem[]): Promise<InvoiceLineItem[]> {
+    return Promise.all(lineItemsData.map((lineItemData) => this.createLineItem(lineItemData)));
+  }
+
   async deleteLineItem(id: string): Promise<boolean> {
     return this.invoiceLineItems.delete(id);
   }
@@ -431,7 +527,7 @@ export class MemStorage implements IStorage {
   // System Settings (for system-wide QuickBooks config)
   private systemSettings: Map<string, any> = new Map();
 
-  async getSystemSetting(key: string): Promise<any> {
+  async getSystemSetting(key: string, _options?: { bypassCache?: boolean }): Promise<any> {
     return this.systemSettings.get(key);
   }
 